@@ -11,20 +11,14 @@ Original file is located at
 
 # STEP 1: Import Required Libraries
 import os
-import io
-import glob
+import time
 from pathlib import Path
-import pandas as pd
 import streamlit as st
 from dotenv import load_dotenv
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
-from langchain_unstructured import UnstructuredLoader
-from langchain_community.vectorstores import FAISS
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain.schema import Document as LCDocument
-from PyPDF2 import PdfReader
-from docx import Document
+from risk_analysis import ANALYSIS_MODES, RETRIEVAL_MODES
+from jobs import ACTIVE_STATUSES, run_analysis
+from app_common import job_manager, preview_file, render_analysis_panels, render_revision_diff, render_run_profile, submitter_id, watch_job
+from history_store import EXPORT_FORMATS, AnalysisHistory
 import warnings
 import shutil
 import streamlit as st
@@ -32,167 +26,26 @@ import streamlit.components.v1 as components
 
 
 warnings.filterwarnings("ignore", category=DeprecationWarning)
-warnings.filterwarnings("ignore", category=pd.errors.ParserWarning)
 
 # STEP 2: Load Environment Variables
 load_dotenv()
 IFI_API_KEY = os.getenv("IFI_API_KEY")  # <-- ADD YOUR API KEY to .streamlit/secrets.toml or env vars
+# flat (exact), ivf, hnsw, ivfpq or sqfp16; compressed types suit very large histories
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "flat")
+# openai, or hashing for local embeddings on air-gapped deployments
+EMBEDDINGS_BACKEND = os.getenv("EMBEDDINGS_BACKEND", "openai")
+# ANALYSIS_WORKERS and MAX_CONCURRENT_LLM_CALLS size the shared job queue (app_common.job_manager)
 
-# STEP 3: Ensure necessary folders exist before file operations
-for folder in ['historical_documents', 'risks_document', 'target_document', 'outputs']:
-    Path(folder).mkdir(parents=True, exist_ok=True)
-
-# STEP 4: Define the RAG Risk Analysis Class
-class RAGProcurementRisksAnalysis:
-    def __init__(self, api_key, query, historical_documents_folder_path, risks_document_folder_path, target_document_folder_path, risk_analysis_output_path):
-        self.api_key = api_key
-        self.query = query
-        self.historical_documents = self.load_documents(historical_documents_folder_path)
-        self.risks_document = self.load_documents(risks_document_folder_path)
-        self.target_document = self.load_documents(target_document_folder_path)
-        self.risk_analysis_output_path = risk_analysis_output_path
-
-    def load_documents(self, folder_path):
-        all_documents = []
-        supported_exts = ["csv", "pdf", "docx"]
-        for ext in supported_exts:
-            files = glob.glob(f"{folder_path}/*.{ext}")
-            for file_path in files:
-                try:
-                    if file_path.endswith(".csv"):
-                        try:
-                            with open(file_path, "r", encoding="utf-8") as f:
-                                content = f.read()
-                        except UnicodeDecodeError:
-                            with open(file_path, "r", encoding="latin1") as f:
-                                content = f.read()
-                        doc = LCDocument(page_content=content)
-                        all_documents.append(doc)
-
-                    else:
-                        loader = UnstructuredLoader(file_path=file_path)
-                        documents = loader.load()
-                        all_documents.extend(documents)
-                except Exception as e:
-                    print(f"⚠️ Could not load {file_path}: {e}")
-        print(f"📄 Loaded {len(all_documents)} docs from {folder_path}")
-        return all_documents
-
-    def create_embeddings(self):
-        embeddings = OpenAIEmbeddings(openai_api_key=self.api_key)
-        vector_store = FAISS.from_documents(self.historical_documents, embeddings)
-        return vector_store, embeddings
-
-    def semantic_search(self):
-        vector_store, embeddings = self.create_embeddings()
-        query_embedding = embeddings.embed_query(self.query)
-        risks_document_embedding = embeddings.embed_query(self.risks_document[0].page_content)
-        target_document_embedding = embeddings.embed_query(self.target_document[0].page_content)
-    
-        retrieved_by_query = vector_store.similarity_search_by_vector(query_embedding, k=3)
-        retrieved_by_risks = vector_store.similarity_search_by_vector(risks_document_embedding, k=3)
-        retrieved_by_target = vector_store.similarity_search_by_vector(target_document_embedding, k=3)
-    
-        retrieved_documents = list({doc.page_content: doc for doc in retrieved_by_query + retrieved_by_target + retrieved_by_risks}.values())
+# STEP 3: Analysis history
+@st.cache_resource
+def analysis_history():
+    # The same store the analysis jobs record into
+    return AnalysisHistory()
 
-        if not retrieved_documents:
-            print("⚠️ No documents retrieved during semantic search!")
-    
-        print(f"🔍 Retrieved {len(retrieved_documents)} relevant docs for semantic search.")
-    
-        return "\n\n".join([f"Document {i + 1}: {doc.page_content}" for i, doc in enumerate(retrieved_documents)])
 
-    def save_risk_analysis_to_file(self, risk_analysis):
-        file_path = f"{self.risk_analysis_output_path}/risk_analysis.txt"
-        os.makedirs(self.risk_analysis_output_path, exist_ok=True)
-        with open(file_path, "w") as file:
-            file.write(risk_analysis)
-    
-    def generate_risks_analysis_rag(self):
-        llm = ChatOpenAI(model="gpt-4o", temperature=0.5, openai_api_key=self.api_key)
-    
-        retrieved_docs_str = self.semantic_search()
-        risks_content = self.risks_document[0].page_content
-        target_content = self.target_document[0].page_content
-    
-        # Add fallback for empty inputs
-        if not retrieved_docs_str.strip():
-            retrieved_docs_str = "No relevant documents were retrieved. Please proceed with only risks and target documents."
-    
-        if not risks_content.strip():
-            st.error("❌ The risks document is empty. Please upload a valid file.")
-            return "Error: Risks document is empty."
-    
-        if not target_content.strip():
-            st.error("❌ The target document is empty. Please upload a valid file.")
-            return "Error: Target document is empty."
-    
-        # Debug logs
-        print("----- Prompt Preview -----")
-        print("Query:", self.query)
-        print("--- Retrieved Docs ---")
-        print(retrieved_docs_str[:500])
-        print("--- Risks Document ---")
-        print(risks_content[:500])
-        print("--- Target Document ---")
-        print(target_content[:500])
+EXPORT_FORMAT_LABELS = {"parquet": "Parquet", "xlsx": "Excel", "json": "JSON"}
 
-    
-        prompt_template = PromptTemplate(
-            input_variables=["retrieved_docs_str", "risks_document_content", "target_document_content"],
-            template='''You are a procurement risk assessment AI. Evaluate the risks associated with the target document
-    based on the retrieved knowledge and the risks detailed in the risks document.
-    
-    ### Target Document:
-    {target_document_content}
-    
-    ### Risks Document:
-    {risks_document_content}
-    
-    ### Retrieved Risk-Related Documents:
-    {retrieved_docs_str}
-    
-    ### Task:
-    Analyze the target document and classify risks into the categories detailed in the risks document.
-    
-    Output the risk labels and a short explanation for each.
-    
-    Risk Assessment:
-    
-    Based on the risks document summarize a mitigation plan.
-    
-    Mitigation Plan:'''
-        )
-    
-        chain = LLMChain(llm=llm, prompt=prompt_template)
-        risk_analysis = chain.run({
-            "retrieved_docs_str": retrieved_docs_str,
-            "risks_document_content": risks_content,
-            "target_document_content": target_content
-        })
-    
-        self.save_risk_analysis_to_file(risk_analysis)
-        return risk_analysis
-
-
-# STEP 5: Preview Function
-def preview_file(file, file_type, name="Uploaded file"):
-    st.subheader(f"Preview: {name}")
-    if file_type == "csv":
-        df = pd.read_csv(file)
-        st.dataframe(df.head())
-    elif file_type == "pdf":
-        reader = PdfReader(file)
-        text = "\n".join([page.extract_text() for page in reader.pages[:2] if page.extract_text()])
-        st.markdown("#### 📑 Extracted Preview with Highlights")
-        highlighted_text = text[:2000].replace("risk", "**:red[risk]**").replace("delay", "**:orange[delay]**")
-        st.markdown(highlighted_text, unsafe_allow_html=True)
-    elif file_type == "docx":
-        doc = Document(file)
-        text = "\n".join([p.text for p in doc.paragraphs])
-        st.text_area("DOCX Preview", text[:2000], height=200)
-
-# STEP 6: Streamlit UI Setup
+# STEP 4: Streamlit UI Setup
 st.set_page_config(page_title="Procurement Risk Analyzer", layout="centered")
 
 st.title("📄 Procurement Risk Analyzer")
@@ -206,6 +59,7 @@ This tool uses LLM-based Retrieval-Augmented Generation (RAG) to assess risks in
 - Preview documents before analysis
 - Securely runs in your environment
 ''')
+show_run_profile = st.sidebar.checkbox("⏱️ Show run profile", help="Per-stage timings, token counts and estimated cost of the last run.")
 
 with st.expander("📁 Download Example Templates", expanded=True):
     col1, col2, col3 = st.columns(3)
@@ -262,137 +116,202 @@ target_file = st.file_uploader(
     help="🎯 The target document is the procurement form or data you'd like to analyze. It should contain project variables, dates, and dependencies.\n\nExample: Target Doc.csv"
 )
 
-historical_file_bytes = []
 if historical_files:
     for f in historical_files:
-        bytes_data = f.getvalue()
         file_ext = f.name.split(".")[-1]
-        st.text(f"🧪 Uploaded historical file: {f.name}, size: {len(bytes_data)} bytes")
-        preview_file(io.BytesIO(bytes_data), file_ext, name=f.name)
-        historical_file_bytes.append((f.name, bytes_data))
+        st.text(f"🧪 Uploaded historical file: {f.name}, size: {f.size} bytes")
+        preview_file(f, file_ext, name=f.name, highlight_pdf=True)
 
 if risks_file:
-    risks_bytes = risks_file.getvalue()
     file_ext = risks_file.name.split(".")[-1]
-    st.text(f"🧪 Uploaded risks file: {risks_file.name}, size: {len(risks_bytes)} bytes")
-    preview_file(io.BytesIO(bytes_data), file_ext, name=f.name)
+    st.text(f"🧪 Uploaded risks file: {risks_file.name}, size: {risks_file.size} bytes")
+    preview_file(risks_file, file_ext, name=risks_file.name, highlight_pdf=True)
 
 
 if target_file:
-    target_bytes = target_file.getvalue()
     file_ext = target_file.name.split(".")[-1]
-    st.text(f"🧪 Uploaded target file: {target_file.name}, size: {len(target_bytes)} bytes")
-    preview_file(io.BytesIO(bytes_data), file_ext, name=f.name)
+    st.text(f"🧪 Uploaded target file: {target_file.name}, size: {target_file.size} bytes")
+    preview_file(target_file, file_ext, name=target_file.name, highlight_pdf=True)
 
 
 
+force_refresh = st.checkbox("🔄 Force refresh", help="Ignore cached results and re-run the full analysis.")
+retrieval_mode = st.selectbox(
+    "🔎 Retrieval mode",
+    RETRIEVAL_MODES,
+    help="Hybrid fuses keyword (BM25) and embedding search; lexical needs no embedding calls.",
+)
+analysis_mode = st.selectbox(
+    "🧩 Analysis mode",
+    ANALYSIS_MODES,
+    format_func=lambda mode: {"single": "Single prompt", "map_reduce": "Per risk category (parallel)"}[mode],
+    help="Per risk category assesses each Risk Type of the register in its own concurrent LLM call and merges the results.",
+)
+if analysis_mode == "single":
+    st.caption("ℹ️ Single prompt re-analyzes the whole target on every run; per risk category re-runs only the categories touched by changed rows.")
+
 if st.button("Run Analysis"):
     if not IFI_API_KEY:
         st.error("Missing API key!")
     elif not historical_files or not risks_file or not target_file:
         st.warning("Please upload all required files.")
     else:
-        with st.spinner("Processing files and analyzing..."):
-            base_dir = Path(".")
-
-            # Save historical files
-            for fname, fbytes in historical_file_bytes:
-                with open(base_dir / "historical_documents" / fname, "wb") as out:
-                    out.write(fbytes)
-
-            # Save risks file
-            risks_path = base_dir / "risks_document" / risks_file.name
-            with open(risks_path, "wb") as out:
-                out.write(risks_bytes)
-
-            # Save target file
-            target_path = base_dir / "target_document" / target_file.name
-            with open(target_path, "wb") as out:
-                out.write(target_bytes)
-
-            # Run RAG analysis
-            rag = RAGProcurementRisksAnalysis(
-                api_key=IFI_API_KEY,
-                query=query,
-                historical_documents_folder_path=base_dir / "historical_documents",
-                risks_document_folder_path=base_dir / "risks_document",
-                target_document_folder_path=base_dir / "target_document",
-                risk_analysis_output_path=base_dir / "outputs"
-            )
-
-            st.text(f"📄 Loaded {len(rag.risks_document)} risks doc(s)")
-            if rag.risks_document:
-                st.text(f"🔎 Risks doc preview:\n{rag.risks_document[0].page_content[:300]}")
-
-            if not rag.historical_documents:
-                st.error("❌ Could not load any content from historical documents.")
-            elif not rag.risks_document:
-                st.error("❌ Could not load any content from the risks document.")
-            elif not rag.target_document:
-                st.error("❌ Could not load any content from the target document.")
-            else:
-                result = rag.generate_risks_analysis_rag()
-                st.success("✅ Analysis complete!")
-              st.markdown("### 📊 Risk Summary Panel")
-
-              # Simulated values – replace with parsed values later
-              col1, col2, col3 = st.columns(3)
-              col1.metric("🟥 High Risks", "2")
-              col2.metric("🟧 Medium Risks", "3")
-              col3.metric("🟩 Low Risks", "4")
-              
-              st.markdown("**📈 Budget Variance:** $700,000 Overrun")
-              st.markdown("**🕒 Schedule Variance:** +15 days late")
-              
-              # Visual risk score (simulate with bar)
-              st.progress(0.68)
-              st.markdown("**Risk Score:** 68/100 — Moderate")
-
-
-                st.markdown("### 📤 Export & Share")
-                with st.spinner("Generating full report..."):
-                    st.download_button("📄 Download as PDF", result, file_name="risk_analysis.pdf")
-                    st.download_button("📊 Export to Excel", result, file_name="risk_analysis.xlsx")
-                    st.download_button("💾 Export as JSON", result, file_name="risk_analysis.json")
-
-                if "Mitigation Plan:" in result:
-                    risk_section, mitigation_section = result.split("Mitigation Plan:", 1)
-                else:
-                    risk_section = result
-                    mitigation_section = ""
-
-                with st.expander("📋 Risk Explorer Panel", expanded=True):
-                    st.markdown("Filter and review each risk found:")
-                
-                    # Simulate parsed risks
-                    parsed_risks = [
-                        {"title": "Phase 1 Delay", "type": "📅 Schedule", "severity": "High", "confidence": 87, "key_data": "15 days late", "mitigation": "Reschedule milestone with buffer"},
-                        {"title": "Supplier Budget Overrun", "type": "💰 Cost", "severity": "Medium", "confidence": 75, "key_data": "$200K over", "mitigation": "Re-negotiate supplier terms"},
-                    ]
-                
-                    for i, risk in enumerate(parsed_risks):
-                        with st.expander(f"{risk['type']} **{risk['title']}** — {risk['severity']} Risk ({risk['confidence']}%)"):
-                            st.markdown(f"**Key Insight:** {risk['key_data']}")
-                            st.markdown(f"**Mitigation Plan:** {risk['mitigation']}")
-                st.markdown("### ⏱️ Timeline View")
-                st.markdown("Visualize risk timing across project phases")
-                
-                import plotly.express as px
-                import pandas as pd
-                
-                timeline_data = pd.DataFrame([
-                    dict(Task="Planning", Start='2024-01-01', Finish='2024-01-15', Risk="None"),
-                    dict(Task="Phase 1", Start='2024-01-16', Finish='2024-02-15', Risk="Delay"),
-                    dict(Task="Phase 2", Start='2024-02-16', Finish='2024-03-15', Risk="Cost Overrun"),
-                ])
-                
-                fig = px.timeline(timeline_data, x_start="Start", x_end="Finish", y="Task", color="Risk")
-                st.plotly_chart(fig, use_container_width=True)
-
-
-
-                if mitigation_section.strip():
-                    with st.expander("🛡️ Mitigation Panel", expanded=True):
-                        mitigation_items = mitigation_section.strip().split("\n")
-                        for m in mitigation_items:
-                            st.checkbox(f"🛠 {m.strip()}")
+        # The job id in the URL brings the run back after a page refresh
+        st.query_params["job"] = job_manager().submit(
+            run_analysis,
+            # Upload bytes are only copied out when an analysis is actually submitted
+            historical_uploads=[(f.name, f.getvalue()) for f in historical_files],
+            risks_upload=(risks_file.name, risks_file.getvalue()),
+            target_upload=(target_file.name, target_file.getvalue()),
+            force_refresh=force_refresh,
+            api_key=IFI_API_KEY,
+            query=query,
+            retrieval_mode=retrieval_mode,
+            analysis_mode=analysis_mode,
+            revision_key=f"{submitter_id()}/{target_file.name}",
+            index_type=VECTOR_INDEX_TYPE,
+            embeddings_backend=EMBEDDINGS_BACKEND,
+        )
+
+job_id = st.query_params.get("job")
+job = job_manager().get(job_id) if job_id else None
+if job_id and job is None:
+    st.warning("⚠️ This analysis job was not found. Please run the analysis again.")
+elif job and job["status"] in ACTIVE_STATUSES:
+    watch_job(job_id)
+elif job and job["status"] == "cancelled":
+    st.info("🛑 Analysis cancelled.")
+elif job and job["status"] == "interrupted":
+    st.warning("⚠️ The server restarted before this analysis finished. Please run it again.")
+elif job and job["status"] == "failed":
+    st.error(f"❌ {job['error']}")
+elif job:
+    output = job["result"]
+    result = output["text"]
+    st.text(f"📄 Loaded {output['risks_documents']} risks doc(s)")
+    if output["risks_preview"]:
+        st.text(f"🔎 Risks doc preview:\n{output['risks_preview']}")
+
+    with st.expander("📋 Risk Assessment", expanded=True):
+        risk_placeholder = st.empty()
+    with st.expander("🛡️ Mitigation Plan", expanded=True):
+        mitigation_placeholder = st.empty()
+    render_analysis_panels(result, risk_placeholder, mitigation_placeholder)
+    if result.startswith("Error:"):
+        st.error(f"❌ {result}")
+    else:
+        st.success("✅ Analysis complete!")
+    context_report = output["context_report"]
+    if context_report and context_report["dropped"]:
+        st.caption(f"✂️ Context trimmed to {context_report['used_tokens']}/{context_report['budget']} tokens; dropped: {'; '.join(context_report['dropped'])}")
+    if output["revision_changes"] is not None:
+        render_revision_diff(output["revision_changes"], output["reanalyzed_categories"])
+    if output["result_cache_hit"]:
+        st.caption("⚡ Served from the result cache. Tick Force refresh to re-run the analysis.")
+    embedding_cache_stats = output["embedding_cache_stats"]
+    if embedding_cache_stats:
+        st.caption(f"🧮 Embedding cache: {embedding_cache_stats['hits']} hits, {embedding_cache_stats['misses']} misses")
+    if show_run_profile:
+        render_run_profile(output["profile"])
+    st.markdown("### 📊 Risk Summary Panel")
+
+    # Computed from the target and risk register by risk_scoring, not by the LLM
+    metrics = output["risk_metrics"]
+    if metrics is None:
+        st.info("Summary metrics need CSV target and risks documents.")
+    else:
+        evidence_help = "Register risks in categories with adverse evidence in this target (schedule slip, cost overrun)"
+        col1, col2, col3 = st.columns(3)
+        col1.metric("🟥 High Risks", metrics["high_risks"], help=evidence_help)
+        col2.metric("🟧 Medium Risks", metrics["medium_risks"], help=evidence_help)
+        col3.metric("🟩 Low Risks", metrics["low_risks"], help=evidence_help)
+        st.caption(f"Whole risk register: {metrics['register_high_risks']} High, {metrics['register_medium_risks']} Medium, {metrics['register_low_risks']} Low")
+
+        if metrics["cost_variance"] is not None:
+            direction = "Overrun" if metrics["cost_variance"] > 0 else "Under budget"
+            st.markdown(f"**📈 Budget Variance:** ${abs(metrics['cost_variance']):,.0f} {direction}")
+        if metrics["schedule_variance_days"] is not None:
+            direction = "late" if metrics["schedule_variance_days"] > 0 else "early or on time"
+            st.markdown(f"**🕒 Schedule Variance:** {metrics['schedule_variance_days']:+d} days {direction}")
+
+        st.progress(metrics["risk_score"] / 100)
+        st.markdown(f"**Risk Score:** {metrics['risk_score']}/100 — {metrics['risk_score_label']}")
+
+
+    st.markdown("### 📤 Export & Share")
+    with st.spinner("Generating full report..."):
+        st.download_button("📄 Download as text", result, file_name="risk_analysis.txt")
+        if output["history_id"] is not None:
+            # Built from the stored analysis (one row per parsed risk and per mitigation item), only when asked for
+            analysis_format = st.selectbox("Export format", EXPORT_FORMATS, format_func=EXPORT_FORMAT_LABELS.get, key="analysis_export_format")
+            if st.button("📦 Prepare export"):
+                st.download_button(f"⬇️ Download {EXPORT_FORMAT_LABELS[analysis_format]} export", analysis_history().export(analysis_format, [output["history_id"]]), file_name=f"risk_analysis.{analysis_format}")
+
+    if "Mitigation Plan:" in result:
+        risk_section, mitigation_section = result.split("Mitigation Plan:", 1)
+    else:
+        risk_section = result
+        mitigation_section = ""
+
+    with st.expander("📋 Risk Explorer Panel", expanded=True):
+        st.markdown("Filter and review each risk found:")
+
+        # Simulate parsed risks
+        parsed_risks = [
+            {"title": "Phase 1 Delay", "type": "📅 Schedule", "severity": "High", "confidence": 87, "key_data": "15 days late", "mitigation": "Reschedule milestone with buffer"},
+            {"title": "Supplier Budget Overrun", "type": "💰 Cost", "severity": "Medium", "confidence": 75, "key_data": "$200K over", "mitigation": "Re-negotiate supplier terms"},
+        ]
+
+        for i, risk in enumerate(parsed_risks):
+            with st.expander(f"{risk['type']} **{risk['title']}** — {risk['severity']} Risk ({risk['confidence']}%)"):
+                st.markdown(f"**Key Insight:** {risk['key_data']}")
+                st.markdown(f"**Mitigation Plan:** {risk['mitigation']}")
+    st.markdown("### ⏱️ Timeline View")
+    st.markdown("Visualize risk timing across project phases")
+
+    import plotly.express as px
+    import pandas as pd
+
+    timeline_data = pd.DataFrame([
+        dict(Task="Planning", Start='2024-01-01', Finish='2024-01-15', Risk="None"),
+        dict(Task="Phase 1", Start='2024-01-16', Finish='2024-02-15', Risk="Delay"),
+        dict(Task="Phase 2", Start='2024-02-16', Finish='2024-03-15', Risk="Cost Overrun"),
+    ])
+
+    fig = px.timeline(timeline_data, x_start="Start", x_end="Finish", y="Task", color="Risk")
+    st.plotly_chart(fig, use_container_width=True)
+
+
+
+    if mitigation_section.strip():
+        with st.expander("🛡️ Mitigation Panel", expanded=True):
+            mitigation_items = mitigation_section.strip().split("\n")
+            for m in mitigation_items:
+                st.checkbox(f"🛠 {m.strip()}")
+
+@st.fragment
+def render_portfolio_history():
+    # Reruns on its own, and only queries the history store while switched on; nothing is re-analyzed
+    if not st.toggle("Show risks across every past analysis"):
+        return
+    history = analysis_history()
+    col1, col2, col3 = st.columns(3)
+    portfolio_types = col1.multiselect("Risk types", history.risk_types())
+    portfolio_severities = col2.multiselect("Severities", ["High", "Medium", "Low"])
+    period_days = col3.selectbox("Period", [30, 90, 365, None], format_func=lambda days: f"Last {days} days" if days else "All time")
+    since = time.time() - period_days * 24 * 3600 if period_days else None
+
+    portfolio = history.portfolio(portfolio_types, portfolio_severities, since=since)
+    if portfolio.empty:
+        st.info("No recorded analyses match these filters yet.")
+        return
+    st.bar_chart(portfolio.fillna({"risk_type": "Unclassified", "severity": "Unrated"}), x="risk_type", y="analyses", color="severity")
+    st.dataframe(portfolio, hide_index=True)
+    portfolio_ids = history.analysis_ids(portfolio_types, portfolio_severities, since=since)
+    export_format = st.selectbox("Export format", EXPORT_FORMATS, format_func=EXPORT_FORMAT_LABELS.get, key="portfolio_export_format")
+    if st.button(f"📦 Prepare export of {len(portfolio_ids)} analyses"):
+        st.download_button("⬇️ Download portfolio export", history.export(export_format, portfolio_ids), file_name=f"risk_portfolio.{export_format}")
+
+
+st.markdown("### 📚 Portfolio History")
+render_portfolio_history()
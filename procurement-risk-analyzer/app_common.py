@@ -0,0 +1,119 @@
+"""Streamlit helpers shared by app.py and WiseAcquire_app.py.
+
+Background job queue, upload previews and the result panels.
+"""
+
+import os
+import uuid
+import warnings
+
+import streamlit as st
+
+from extractors import extract_preview
+from jobs import ACTIVE_STATUSES, JOB_STAGES, JobManager
+
+# Previews read only the first rows or pages of the upload stream, so a huge file previews as fast as a small one
+PREVIEW_ROWS = 5
+PREVIEW_HIGHLIGHTS = {"risk": "red", "delay": "orange"}
+
+
+# One queue per server process, shared by every session; job state is kept under analysis_jobs/
+@st.cache_resource
+def job_manager():
+    # Analyses run on a background worker pool; LLM calls are capped across all of its jobs.
+    # Read here rather than at import so the apps' load_dotenv() has already run.
+    return JobManager(
+        max_workers=int(os.getenv("ANALYSIS_WORKERS", "2")),
+        max_concurrent_llm_calls=int(os.getenv("MAX_CONCURRENT_LLM_CALLS", "4")),
+    )
+
+
+def submitter_id():
+    # Revision history is kept per signed-in user, or per browser session without auth
+    if "submitter_id" not in st.session_state:
+        st.session_state.submitter_id = st.user.get("email") or uuid.uuid4().hex
+    return st.session_state.submitter_id
+
+
+@st.cache_data(show_spinner=False, max_entries=128)
+def parse_preview(file_id, file_type, _upload):
+    # Keyed on the upload's id: hashing the file's bytes on every rerun would cost as much as reading it
+    _upload.seek(0)
+    if file_type == "csv":
+        # pandas is only loaded once a CSV is actually previewed
+        import pandas as pd
+
+        warnings.filterwarnings("ignore", category=pd.errors.ParserWarning)
+        return pd.read_csv(_upload, nrows=PREVIEW_ROWS, encoding_errors="replace")
+    return extract_preview(_upload, file_type)
+
+
+def preview_file(upload, file_type, name="Uploaded file", highlight_pdf=False):
+    st.subheader(f"Preview: {name}")
+    preview = parse_preview(upload.file_id, file_type, upload)
+    if file_type == "csv":
+        st.dataframe(preview)
+    elif file_type == "pdf" and highlight_pdf:
+        st.markdown("#### 📑 Extracted Preview with Highlights")
+        highlighted_text = preview[:2000]
+        for word, color in PREVIEW_HIGHLIGHTS.items():
+            highlighted_text = highlighted_text.replace(word, f"**:{color}[{word}]**")
+        st.markdown(highlighted_text, unsafe_allow_html=True)
+    elif file_type == "pdf":
+        st.text_area("PDF Preview", preview[:2000], height=200)
+    elif file_type == "docx":
+        st.text_area("DOCX Preview", preview[:2000], height=200)
+
+
+def render_analysis_panels(text, risk_placeholder, mitigation_placeholder, streaming=False):
+    risk_section, _, mitigation_section = text.partition("Mitigation Plan:")
+    cursor = " ▌" if streaming else ""
+    if mitigation_section.strip():
+        risk_placeholder.markdown(risk_section.strip(), unsafe_allow_html=True)
+        mitigation_placeholder.markdown(mitigation_section.strip() + cursor, unsafe_allow_html=True)
+    else:
+        risk_placeholder.markdown(risk_section.strip() + cursor, unsafe_allow_html=True)
+
+
+@st.fragment(run_every=1.0)
+def watch_job(job_id):
+    # Polls the job without rerunning the rest of the page
+    job = job_manager().get(job_id)
+    if job is None or job["status"] not in ACTIVE_STATUSES:
+        # One full rerun swaps the progress view for the finished result
+        st.rerun()
+    st.progress(JOB_STAGES.index(job["stage"]) / (len(JOB_STAGES) - 1), text=f"⏳ {job['stage'].capitalize()}...")
+    with st.expander("📋 Risk Assessment", expanded=True):
+        risk_placeholder = st.empty()
+    with st.expander("🛡️ Mitigation Plan", expanded=True):
+        mitigation_placeholder = st.empty()
+    if job["partial_text"]:
+        render_analysis_panels(job["partial_text"], risk_placeholder, mitigation_placeholder, streaming=True)
+    if st.button("🛑 Cancel analysis"):
+        job_manager().cancel(job_id)
+
+
+def render_revision_diff(changes, reanalyzed_categories):
+    with st.expander(f"🔁 {len(changes)} row(s) changed since the last analysis of this target", expanded=bool(changes)):
+        if reanalyzed_categories is not None:
+            kept = "; every other category kept its previous assessment" if reanalyzed_categories else ""
+            st.caption(f"♻️ Re-analyzed: {', '.join(reanalyzed_categories) or 'nothing'}{kept}")
+        rows = []
+        for change in changes:
+            before, after = change["before"] or {}, change["after"] or {}
+            for field in dict.fromkeys([*before, *after]):
+                if before.get(field) != after.get(field):
+                    rows.append({"Data Point ID": change["id"], "change": change["change"], "field": field, "before": before.get(field), "after": after.get(field)})
+        if rows:
+            st.dataframe(rows, hide_index=True)
+
+
+def render_run_profile(profile):
+    summary = profile["summary"]
+    with st.sidebar.expander("⏱️ Run profile", expanded=True):
+        cost = f"${summary['cost_usd']:.4f}" if summary["cost_usd"] is not None else "n/a"
+        st.caption(f"Run {summary['run_id']}: {summary['total_ms'] / 1000:.2f}s, {summary['input_tokens']} in / {summary['output_tokens']} out tokens, est. {cost}")
+        st.dataframe(
+            [{"stage": span["stage"], "start_ms": span.get("start_ms"), "ms": span["duration_ms"], **{k: v for k, v in span.items() if k not in ("run_id", "stage", "start_ms", "duration_ms")}} for span in profile["spans"]],
+            hide_index=True,
+        )
@@ -0,0 +1,163 @@
+"""Headless batch risk analysis for a directory of target documents.
+
+The historical index and the risk register are built once; targets are then
+analyzed concurrently on a bounded thread pool, writing one result file per
+target.
+
+Example:
+    python batch_cli.py --targets contracts/ --history historical_documents/ \
+        --risks risks_document/ --output outputs/batch --workers 8
+"""
+
+import argparse
+import concurrent.futures
+import glob
+import os
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from embeddings_backends import EMBEDDING_BACKENDS
+from loaders import load_files
+from result_cache import DEFAULT_MAX_ENTRIES
+from revisions import DEFAULT_MAX_REVISIONS
+from risk_analysis import ANALYSIS_MODES, RETRIEVAL_MODES, SUPPORTED_EXTS, RAGProcurementRisksAnalysis
+from vector_index import INDEX_TYPES
+
+DEFAULT_QUERY = "What are the risks associated with this procurement document?"
+
+
+def find_targets(targets_folder_path):
+    target_paths = []
+    for ext in SUPPORTED_EXTS:
+        target_paths.extend(glob.glob(f"{targets_folder_path}/*.{ext}"))
+    return sorted(target_paths)
+
+
+def result_file_name(target_path):
+    # Keep the extension so contract.csv and contract.pdf do not collide
+    return f"{Path(target_path).name}.risk_analysis.txt"
+
+
+def analyze_target(rag, target_path, force_refresh=False):
+    target_documents = load_files([target_path])
+    if not target_documents:
+        raise ValueError("could not load any content")
+    # Keyed by the relative path, so same-named targets in different folders keep separate revisions
+    target_rag = rag.for_target(target_documents, output_file_name=result_file_name(target_path), revision_key=os.path.relpath(target_path))
+    result = target_rag.generate_risks_analysis_rag(force_refresh=force_refresh)
+    if result.startswith("Error:"):
+        raise ValueError(result)
+    return target_rag.profile.summary()
+
+
+def write_metrics_summary(rag, target_paths, output_folder_path):
+    from risk_scoring import read_csv_text, summarize_targets
+    import pandas as pd
+
+    # One vectorized pass over every CSV target instead of per-target scoring
+    csv_targets = {Path(path).name: pd.read_csv(path) for path in target_paths if path.endswith(".csv")}
+    if not csv_targets:
+        return None
+    summary = summarize_targets(csv_targets, read_csv_text(rag.risks_content))
+    summary_path = os.path.join(output_folder_path, "risk_metrics.csv")
+    os.makedirs(output_folder_path, exist_ok=True)
+    summary.to_csv(summary_path)
+    return summary_path
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze procurement risks for every document in a folder.")
+    parser.add_argument("--targets", required=True, help="Folder of target documents (.csv, .pdf, .docx)")
+    parser.add_argument("--history", default="historical_documents", help="Folder of historical documents")
+    parser.add_argument("--risks", default="risks_document", help="Folder containing the risks document")
+    parser.add_argument("--output", default="outputs/batch", help="Folder for the per-target result files")
+    parser.add_argument("--index", default="historical_index", help="Folder of the persistent historical index")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="flat", help="FAISS index type; ivf/hnsw/ivfpq/sqfp16 trade recall for memory and speed")
+    parser.add_argument("--embeddings-backend", choices=EMBEDDING_BACKENDS, default=os.getenv("EMBEDDINGS_BACKEND", "openai"), help="openai, or hashing for local embeddings without network")
+    parser.add_argument("--query", default=DEFAULT_QUERY)
+    parser.add_argument("--workers", type=int, default=4, help="Targets analyzed concurrently")
+    parser.add_argument("--retrieval-mode", choices=RETRIEVAL_MODES, default="hybrid", help="Keyword (BM25), embedding or fused retrieval")
+    parser.add_argument("--analysis-mode", choices=ANALYSIS_MODES, default="single", help="One prompt, or one concurrent call per Risk Type; only map_reduce re-analyzes just the categories touched by changed rows")
+    parser.add_argument("--llm-concurrency", type=int, default=4, help="Concurrent per-category LLM calls per target in map_reduce mode")
+    parser.add_argument("--result-cache-entries", type=int, default=DEFAULT_MAX_ENTRIES, help="Cached results kept before the least recently used are evicted")
+    parser.add_argument("--revision-entries", type=int, default=DEFAULT_MAX_REVISIONS, help="Target revisions kept for incremental re-analysis; keep above the number of targets swept")
+    parser.add_argument("--force-refresh", action="store_true", help="Ignore cached results and re-run every analysis")
+    parser.add_argument("--skip-existing", action="store_true", help="Skip targets that already have a result file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    load_dotenv()
+    api_key = os.getenv("IFI_API_KEY")
+    if not api_key:
+        print("❌ Missing API key! Set IFI_API_KEY.")
+        return 2
+
+    target_paths = find_targets(args.targets)
+    if args.skip_existing:
+        target_paths = [p for p in target_paths if not os.path.exists(os.path.join(args.output, result_file_name(p)))]
+    if not target_paths:
+        print(f"⚠️ No targets to analyze in {args.targets}")
+        return 0
+
+    rag = RAGProcurementRisksAnalysis(
+        api_key=api_key,
+        query=args.query,
+        historical_documents_folder_path=args.history,
+        risks_document_folder_path=args.risks,
+        target_document_folder_path=None,
+        risk_analysis_output_path=args.output,
+        index_folder_path=args.index,
+        retrieval_mode=args.retrieval_mode,
+        index_type=args.index_type,
+        embeddings_backend=args.embeddings_backend,
+        analysis_mode=args.analysis_mode,
+        max_concurrent_llm_calls=args.llm_concurrency,
+        result_cache_max_entries=args.result_cache_entries,
+        revision_max_entries=args.revision_entries,
+    )
+    if not rag.historical_documents:
+        print("❌ Could not load any content from historical documents.")
+        return 2
+    if not rag.risks_document:
+        print("❌ Could not load any content from the risks document.")
+        return 2
+
+    # Build the shared indexes and open the result cache once, before the workers start
+    if rag.retrieval_mode != "lexical":
+        rag.create_embeddings()
+    if rag.retrieval_mode != "dense":
+        rag.create_lexical_index()
+    rag.get_result_cache()
+
+    started = time.perf_counter()
+    failures = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(analyze_target, rag, path, args.force_refresh): path for path in target_paths}
+        for done, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+            path = futures[future]
+            try:
+                profile = future.result()
+                cost = f", est. ${profile['cost_usd']:.4f}" if profile["cost_usd"] is not None else ""
+                print(f"✅ [{done}/{len(target_paths)}] {path} ({profile['total_ms'] / 1000:.1f}s{cost})")
+            except Exception as e:
+                failures += 1
+                print(f"⚠️ [{done}/{len(target_paths)}] Could not analyze {path}: {e}")
+
+    try:
+        summary_path = write_metrics_summary(rag, target_paths, args.output)
+        if summary_path:
+            print(f"📈 Deterministic metrics for all CSV targets written to {summary_path}")
+    except Exception as e:
+        print(f"⚠️ Could not compute deterministic metrics: {e}")
+
+    print(f"📊 Analyzed {len(target_paths) - failures}/{len(target_paths)} targets in {time.perf_counter() - started:.1f}s; results in {args.output}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""Concurrent-user load test of the shared OpenAI client layer.
+
+A local mock API (openai_mock.py) is started with a server-side requests/min
+limit and random failures. Several simulated users then embed the same
+historical texts and ask for analyses (plain, streamed and concurrent async
+calls) through ``openai_client``. The report shows wall time, how many 429s
+and 503s the server handed out, and what the client layer did about them:
+retries, coalesced embedding requests and time spent waiting on its own
+token buckets. ``--baseline`` runs the same load with fresh default LangChain
+clients per call for comparison.
+
+    python benchmarks/client_bench.py --users 8 --server-rpm 120 --client-rpm 100 --fail-rate 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from openai_mock import start_mock_server  # noqa: E402
+
+MODEL = "gpt-4o"
+HISTORY_TEXTS = [f"Historical procurement record {i}: milestone slipped {i % 7} weeks against plan." for i in range(40)]
+
+
+def make_models(baseline):
+    import openai_client
+    from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+    if baseline:
+        # What every run did before: new clients, SDK retries, no shared limits
+        return (
+            lambda streaming=False, http_async_client=None: ChatOpenAI(model=MODEL, openai_api_key="test", streaming=streaming),
+            lambda: OpenAIEmbeddings(openai_api_key="test", check_embedding_ctx_length=False),
+        )
+    return (
+        lambda streaming=False, http_async_client=None: openai_client.create_chat_model(MODEL, 0.5, "test", streaming=streaming, http_async_client=http_async_client),
+        # Raw strings, so the load does not depend on downloading tiktoken files
+        lambda: openai_client.create_openai_embeddings("test", check_embedding_ctx_length=False),
+    )
+
+
+def simulate_user(user, chat_model, embeddings_model, categories, baseline):
+    import openai_client
+
+    started = time.perf_counter()
+    embeddings_model().embed_documents(HISTORY_TEXTS)
+    chat_model().invoke(f"User {user}: summarize the risks.")
+    "".join(chunk.content for chunk in chat_model(streaming=True).stream(f"User {user}: stream the analysis."))
+
+    async def per_category():
+        http_async_client = None if baseline else openai_client.async_http_client()
+        llm = chat_model(http_async_client=http_async_client)
+        try:
+            await asyncio.gather(*(llm.ainvoke(f"User {user}: assess category {i}.") for i in range(categories)))
+        finally:
+            if http_async_client is not None:
+                await http_async_client.aclose()
+
+    asyncio.run(per_category())
+    return time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the shared OpenAI client against a local mock API.")
+    parser.add_argument("--users", type=int, default=8, help="Concurrent simulated users")
+    parser.add_argument("--categories", type=int, default=4, help="Concurrent async calls per user (map-reduce mode)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock seconds per request")
+    parser.add_argument("--server-rpm", type=int, default=120, help="Mock answers 429 beyond this rate")
+    parser.add_argument("--client-rpm", type=int, default=100, help="Client-side requests/min per model")
+    parser.add_argument("--client-tpm", type=int, default=1_000_000, help="Client-side tokens/min per model")
+    parser.add_argument("--fail-rate", type=float, default=0.05, help="Fraction of mock requests answered with 503")
+    parser.add_argument("--baseline", action="store_true", help="Use fresh default LangChain clients instead of the shared layer")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    server, base_url = start_mock_server(latency=args.latency, requests_per_minute=args.server_rpm, fail_rate=args.fail_rate)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_BASE"] = base_url
+    import openai_client
+
+    openai_client.configure(requests_per_minute=args.client_rpm, tokens_per_minute=args.client_tpm)
+    chat_model, embeddings_model = make_models(args.baseline)
+
+    print(f"🧪 Mock API at {base_url}: {args.server_rpm} RPM limit, {args.fail_rate:.0%} failures")
+    started = time.perf_counter()
+    errors = 0
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        futures = [pool.submit(simulate_user, user, chat_model, embeddings_model, args.categories, args.baseline) for user in range(args.users)]
+        user_seconds = []
+        for future in futures:
+            try:
+                user_seconds.append(future.result())
+            except Exception as e:
+                errors += 1
+                print(f"❌ User failed: {e}")
+    wall_seconds = time.perf_counter() - started
+    server.shutdown()
+
+    report = {
+        "mode": "baseline" if args.baseline else "shared",
+        "users": args.users,
+        "wall_seconds": round(wall_seconds, 2),
+        "slowest_user_seconds": round(max(user_seconds), 2) if user_seconds else None,
+        "failed_users": errors,
+        "server": {**server.state.counts, "max_in_flight": server.state.max_in_flight},
+        "client": None if args.baseline else openai_client.client_stats(),
+    }
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Cold-start benchmark for the app entry points and pipeline modules.
+
+Every target is imported (or, for the Streamlit scripts, executed in bare mode)
+in a fresh interpreter with ``-X importtime``. The report gives the median wall
+time per target and the packages that contributed the most import time, so a
+heavy dependency creeping back into the start-up path is easy to spot.
+
+    python benchmarks/cold_start.py --repeat 5 --top 10 --max-seconds 2.0
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+
+MODULE_TARGETS = ["risk_analysis", "loaders", "extractors", "result_cache", "bm25_index", "jobs", "batch_cli"]
+SCRIPT_TARGETS = ["app.py", "WiseAcquire_app.py"]
+
+
+def target_command(target):
+    if target.endswith(".py"):
+        # Outside `streamlit run` the script executes in bare mode: widgets return defaults
+        code = f"import runpy; runpy.run_path({str(APP_DIR / target)!r}, run_name='__main__')"
+    else:
+        code = f"import {target}"
+    return [sys.executable, "-X", "importtime", "-c", code]
+
+
+def parse_importtime(stderr):
+    # Lines look like: "import time:       123 |       4567 |   package.module"
+    self_us_by_package = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        timings, name = line[len("import time:"):].rsplit("|", 1)
+        self_us = int(timings.split("|")[0])
+        package = name.strip().split(".")[0]
+        self_us_by_package[package] = self_us_by_package.get(package, 0) + self_us
+    return self_us_by_package
+
+
+def run_target(target, repeat, workdir):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(APP_DIR), os.environ.get("PYTHONPATH")])))
+    wall_times = []
+    packages = {}
+    for _ in range(repeat):
+        started = time.perf_counter()
+        completed = subprocess.run(target_command(target), cwd=workdir, env=env, capture_output=True, text=True)
+        wall_times.append(time.perf_counter() - started)
+        if completed.returncode != 0:
+            error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f"exit code {completed.returncode}"
+            return {"target": target, "error": error}
+        packages = parse_importtime(completed.stderr)
+    return {
+        "target": target,
+        "median_seconds": statistics.median(wall_times),
+        "min_seconds": min(wall_times),
+        "packages_ms": {name: us / 1000 for name, us in sorted(packages.items(), key=lambda item: item[1], reverse=True)},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold-start import time of the app modules.")
+    parser.add_argument("targets", nargs="*", default=MODULE_TARGETS + SCRIPT_TARGETS, help="Modules or app scripts to measure")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per target")
+    parser.add_argument("--top", type=int, default=10, help="Packages listed per target")
+    parser.add_argument("--max-seconds", type=float, help="Exit non-zero if any target's median exceeds this")
+    parser.add_argument("--json", help="Also write the full report to this file")
+    args = parser.parse_args(argv)
+
+    # Scripts create their working folders in the cwd, so keep them out of the repo
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [run_target(target, args.repeat, workdir) for target in args.targets]
+
+    regressions = 0
+    for result in results:
+        if "error" in result:
+            regressions += 1
+            print(f"❌ {result['target']}: {result['error']}")
+            continue
+        over_budget = args.max_seconds is not None and result["median_seconds"] > args.max_seconds
+        regressions += over_budget
+        print(f"{'❌' if over_budget else '⏱️'} {result['target']}: median {result['median_seconds']:.3f}s (min {result['min_seconds']:.3f}s)")
+        for name, ms in list(result["packages_ms"].items())[:args.top]:
+            print(f"    {ms:9.1f} ms  {name}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Portfolio query latency of the analysis-history store.
+
+A scratch ``AnalysisHistory`` is filled with synthetic analyses spread over the
+past year, many targets and the example register's risk types. Each one goes
+through the same ``record`` path (and answer parser) as a real run. The report
+gives insert throughput and p50/p95 latency for the dashboard's queries
+(portfolio summary, filtered summary and matching ids) plus the time to export
+a slice, so the dashboard's interactivity can be checked at portfolio scale.
+
+    python benchmarks/history_bench.py --analyses 50000 --queries 20 --export 500
+"""
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+from history_store import AnalysisHistory  # noqa: E402
+
+RISK_TYPES = ["Schedule Risk", "Cost Risk", "Supply Chain Risk", "Technical Risk", "Workforce Risk", "Regulatory & Compliance Risk", "Integration Risk", "Security Risk"]
+SEVERITIES = ["High", "Medium", "Low"]
+DAY_SECONDS = 24 * 3600
+
+
+def synthetic_analysis(rng):
+    risk_types = rng.sample(RISK_TYPES, rng.randint(2, 5))
+    assessment = [f"{i}. {risk_type} - {rng.choice(SEVERITIES)}: exposure seen in {rng.randint(1, 9)} similar contracts." for i, risk_type in enumerate(risk_types, 1)]
+    mitigation = [f"- Review {risk_type} controls with the supplier." for risk_type in risk_types]
+    return "Risk Assessment:\n" + "\n".join(assessment) + "\n\nMitigation Plan:\n" + "\n".join(mitigation)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))]
+
+
+def timed(fn, repeats):
+    seconds = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - started)
+    return {"p50_ms": round(percentile(seconds, 50) * 1000, 2), "p95_ms": round(percentile(seconds, 95) * 1000, 2)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time portfolio queries against a synthetic analysis history.")
+    parser.add_argument("--analyses", type=int, default=50_000)
+    parser.add_argument("--targets", type=int, default=2_000)
+    parser.add_argument("--queries", type=int, default=20, help="Repeats per query")
+    parser.add_argument("--export", type=int, default=500, help="Analyses in the exported slice")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    scores = {risk_type: rng.randint(1, 25) for risk_type in RISK_TYPES}
+    now = time.time()
+    with tempfile.TemporaryDirectory(prefix="history-bench-") as scratch_dir:
+        history = AnalysisHistory(Path(scratch_dir) / "analyses.sqlite")
+        print(f"🧪 Recording {args.analyses} synthetic analyses...")
+        started = time.perf_counter()
+        for _ in range(args.analyses):
+            history.record(
+                f"target-{rng.randrange(args.targets)}",
+                synthetic_analysis(rng),
+                category_scores=scores,
+                metrics={"risk_score": rng.randint(0, 100)},
+                model="gpt-4o",
+                analysis_mode="single",
+                created_at=now - rng.uniform(0, 365 * DAY_SECONDS),
+            )
+        insert_seconds = time.perf_counter() - started
+
+        since = now - 90 * DAY_SECONDS
+        report = {
+            "analyses": args.analyses,
+            "inserts_per_second": round(args.analyses / insert_seconds),
+            "portfolio_all": timed(lambda: history.portfolio(), args.queries),
+            "portfolio_filtered": timed(lambda: history.portfolio(["Cost Risk", "Schedule Risk"], ["High"], since=since), args.queries),
+            "analysis_ids_filtered": timed(lambda: history.analysis_ids(["Cost Risk"], ["High"], since=since), args.queries),
+        }
+        export_ids = history.analysis_ids(limit=args.export)
+        for export_format in ("json", "parquet"):
+            report[f"export_{export_format}"] = timed(lambda: history.export(export_format, export_ids), max(1, args.queries // 4))
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""Recall versus latency report for the FAISS index types.
+
+Each index type is built with the same code the app uses
+(``vector_index.build_faiss_index``), including training on a sample. Its top-k
+results are then compared against exact flat search. Vectors come from a
+clustered Gaussian mixture, or from a ``.npy`` file of real embeddings. The
+report gives build time, index size, per-query p50/p95 latency, batch
+throughput and recall@k, so a deployment can pick its memory/quality trade-off.
+
+    python benchmarks/index_bench.py --vectors 200000 --dim 256 --queries 1000 --k 10
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+from vector_index import INDEX_TYPES, build_faiss_index  # noqa: E402
+
+
+def clustered_vectors(count, dimension, clusters, rng):
+    # Real embeddings are clustered by topic; uniform noise would understate IVF/PQ recall
+    centers = rng.normal(size=(clusters, dimension)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=count)
+    return centers[labels] + 0.35 * rng.normal(size=(count, dimension)).astype(np.float32)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))]
+
+
+def measure(index_type, corpus, queries, exact_ids, k):
+    import faiss
+
+    started = time.perf_counter()
+    index, built_as = build_faiss_index(index_type, corpus)
+    index.add(corpus)
+    build_seconds = time.perf_counter() - started
+
+    latencies = []
+    for query in queries:
+        query_started = time.perf_counter()
+        index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - query_started) * 1000)
+
+    batch_started = time.perf_counter()
+    _, ids = index.search(queries, k)
+    batch_seconds = time.perf_counter() - batch_started
+
+    recall = np.mean([len(set(row) & set(exact)) / k for row, exact in zip(ids, exact_ids)])
+    size_bytes = faiss.serialize_index(index).nbytes
+    return {
+        "index_type": index_type,
+        "built_as": built_as,
+        "build_seconds": round(build_seconds, 2),
+        "size_mb": round(size_bytes / 1024 / 1024, 2),
+        "bytes_per_vector": round(size_bytes / len(corpus), 1),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "batch_qps": round(len(queries) / batch_seconds, 1),
+        f"recall_at_{k}": round(float(recall), 4),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare FAISS index types on recall, latency and memory.")
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--vectors", type=int, default=100_000, help="Synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=256, help="Synthetic vector dimension")
+    parser.add_argument("--clusters", type=int, default=200, help="Topics in the synthetic mixture")
+    parser.add_argument("--npy", help="Use these embeddings (N x dim float32 .npy) instead of synthetic ones")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="Also write the full report to this file")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    if args.npy:
+        vectors = np.load(args.npy).astype(np.float32)
+        rng.shuffle(vectors)
+        corpus, queries = vectors[args.queries:], vectors[:args.queries]
+    else:
+        vectors = clustered_vectors(args.vectors + args.queries, args.dim, args.clusters, rng)
+        corpus, queries = vectors[:args.vectors], vectors[args.vectors:]
+    corpus = np.ascontiguousarray(corpus)
+    queries = np.ascontiguousarray(queries)
+
+    exact_index, _ = build_faiss_index("flat", corpus)
+    exact_index.add(corpus)
+    _, exact_ids = exact_index.search(queries, args.k)
+
+    print(f"📐 {len(corpus)} vectors x {corpus.shape[1]} dims, {len(queries)} queries, k={args.k}")
+    print(f"    {'type':<8}{'build s':>9}{'size MB':>10}{'B/vector':>10}{'p50 ms':>9}{'p95 ms':>9}{'batch QPS':>11}{'recall':>8}")
+    results = []
+    for index_type in args.types:
+        result = measure(index_type, corpus, queries, exact_ids, args.k)
+        results.append(result)
+        label = index_type if result["built_as"] == index_type else f"{index_type}*"
+        print(
+            f"    {label:<8}{result['build_seconds']:>9.2f}{result['size_mb']:>10.2f}{result['bytes_per_vector']:>10.1f}"
+            f"{result['p50_ms']:>9.3f}{result['p95_ms']:>9.3f}{result['batch_qps']:>11.1f}{result[f'recall_at_{args.k}']:>8.3f}"
+        )
+    if any(result["built_as"] != result["index_type"] for result in results):
+        print("    * too few vectors to train this type; measured as flat")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""Local stand-in for the OpenAI embeddings and chat completions endpoints.
+
+It serves deterministic embeddings and canned chat answers (plain or streamed),
+with optional latency, a server-side requests/min limit that answers 429 with
+Retry-After, and random 5xx failures. Point the app or the shared client at it
+with OPENAI_BASE_URL:
+
+    python benchmarks/openai_mock.py --port 8765 --rpm 60 --fail-rate 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=test streamlit run app.py
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import random
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EMBEDDING_DIMENSION = 64
+CHAT_ANSWER = "Risk Assessment:\nSchedule Risk - High: milestone slipped.\n\nMitigation Plan:\nAdd buffer to the next phase."
+
+
+def fake_embedding(text):
+    seed = hashlib.sha256(json.dumps(text).encode("utf-8")).digest()
+    rng = random.Random(seed)
+    return [rng.uniform(-1, 1) for _ in range(EMBEDDING_DIMENSION)]
+
+
+class MockState:
+    def __init__(self, latency=0.0, requests_per_minute=None, fail_rate=0.0, seed=0):
+        self.latency = latency
+        self.requests_per_minute = requests_per_minute
+        self.fail_rate = fail_rate
+        self.random = random.Random(seed)
+        self.counts = {"embeddings": 0, "chat": 0, "rate_limited": 0, "failed": 0}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.recent = deque()
+        self.lock = threading.Lock()
+
+    def admit(self):
+        """None to serve the request, or (status, retry-after seconds) to refuse it."""
+        with self.lock:
+            now = time.monotonic()
+            while self.recent and now - self.recent[0] > 60:
+                self.recent.popleft()
+            if self.requests_per_minute and len(self.recent) >= self.requests_per_minute:
+                self.counts["rate_limited"] += 1
+                return 429, 60 - (now - self.recent[0])
+            self.recent.append(now)
+            if self.random.random() < self.fail_rate:
+                self.counts["failed"] += 1
+                return 503, None
+            return None
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, headers=()):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        state = self.server.state
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        refused = state.admit()
+        if refused is not None:
+            status, wait = refused
+            headers = [("retry-after-ms", str(int(wait * 1000)))] if wait is not None else []
+            self.send_json(status, {"error": {"message": "mock refusal", "type": "rate_limit_error" if status == 429 else "server_error"}}, headers)
+            return
+        with state.lock:
+            state.in_flight += 1
+            state.max_in_flight = max(state.max_in_flight, state.in_flight)
+        try:
+            time.sleep(state.latency)
+            if self.path.endswith("/embeddings"):
+                self.embeddings(state, payload)
+            elif self.path.endswith("/chat/completions"):
+                self.chat(state, payload)
+            else:
+                self.send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+        finally:
+            with state.lock:
+                state.in_flight -= 1
+
+    def embeddings(self, state, payload):
+        raw = payload["input"]
+        # A string, a list of strings, one token-id array or a list of them
+        inputs = raw if isinstance(raw, list) and raw and not isinstance(raw[0], int) else [raw]
+        data = []
+        for index, text in enumerate(inputs):
+            vector = fake_embedding(text)
+            if payload.get("encoding_format") == "base64":
+                vector = base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode("ascii")
+            data.append({"object": "embedding", "index": index, "embedding": vector})
+        with state.lock:
+            state.counts["embeddings"] += 1
+        tokens = sum(len(str(text)) // 4 + 1 for text in inputs)
+        self.send_json(200, {"object": "list", "data": data, "model": payload.get("model", ""), "usage": {"prompt_tokens": tokens, "total_tokens": tokens}})
+
+    def chat(self, state, payload):
+        with state.lock:
+            state.counts["chat"] += 1
+        common = {"id": "chatcmpl-mock", "created": int(time.time()), "model": payload.get("model", "")}
+        if not payload.get("stream"):
+            self.send_json(200, {
+                **common,
+                "object": "chat.completion",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": CHAT_ANSWER}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            })
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        words = CHAT_ANSWER.split(" ")
+        for i, word in enumerate(words):
+            delta = {"content": word if i == 0 else " " + word}
+            self.write_event({**common, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+        self.write_event({**common, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        self.write_chunk(b"data: [DONE]\n\n")
+        self.write_chunk(b"")
+
+    def write_event(self, payload):
+        self.write_chunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+    def write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 resets connections under a burst of concurrent clients
+    request_queue_size = 128
+
+
+def start_mock_server(port=0, **options):
+    """Serve on a background thread; returns (server, base_url). Stop with server.shutdown()."""
+    server = MockServer(("127.0.0.1", port), MockHandler)
+    server.state = MockState(**options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a local mock of the OpenAI embeddings and chat endpoints.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds added to every served request")
+    parser.add_argument("--rpm", type=int, help="Answer 429 beyond this many requests per minute")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    args = parser.parse_args(argv)
+
+    server, base_url = start_mock_server(args.port, latency=args.latency, requests_per_minute=args.rpm, fail_rate=args.fail_rate)
+    print(f"🧪 Mock OpenAI API at {base_url}")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"    {json.dumps(server.state.counts)} max in flight {server.state.max_in_flight}")
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""End-to-end pipeline benchmark on synthetic procurement corpora.
+
+Historical CSVs are generated from the schemas in ``example_files/`` at the
+requested row counts, alongside generated PDF and DOCX files. The full
+``RAGProcurementRisksAnalysis`` pipeline then runs with deterministic local
+embeddings (random per text, or the hashing backend) and a canned-response
+LLM, so no API key or network is needed and the numbers are comparable between
+machines and CI runs. The report gives p50/p95 latency, throughput and peak RSS
+per stage.
+
+    python benchmarks/pipeline_bench.py --rows 1000 10000 100000 --pdfs 5 --docx 5 --repeat 5
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import random
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+EXAMPLES_DIR = APP_DIR.parent / "example_files"
+sys.path.insert(0, str(APP_DIR))
+
+EMBEDDING_SIZE = 256
+LINES_PER_PAGE = 45
+DEFAULT_QUERY = "What are the risks associated with this procurement document?"
+CANNED_ANALYSIS = """Risk Assessment:
+- Schedule Risk (High): the Phase 1 milestone slipped against plan.
+- Cost Risk (High): actual expenditures exceed the initial budget estimate.
+- Technical Risk (Medium): integration challenges remain open.
+
+Mitigation Plan:
+- Re-baseline the schedule and add buffer periods around dependent tasks.
+- Run monthly cost reviews against actuals.
+- Add integration test milestones before the next phase."""
+
+
+def read_template_rows(path):
+    import csv
+
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        return next(reader), list(reader)
+
+
+def perturb_value(value, rng):
+    # Keeps each value's shape (date, number, "12% of tasks ...") while varying the figures
+    try:
+        date = datetime.datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+        return str(date + datetime.timedelta(days=rng.randint(-120, 120)))
+    except ValueError:
+        pass
+    try:
+        number = float(value)
+        return f"{number * rng.uniform(0.7, 1.5):.3f}" if number < 1 else str(int(number * rng.uniform(0.7, 1.5)))
+    except ValueError:
+        pass
+    return re.sub(r"\d+", lambda m: str(max(1, int(int(m.group()) * rng.uniform(0.5, 1.5)))), value)
+
+
+def synthetic_rows(template_rows, count, rng):
+    for i in range(count):
+        data_point_id, *fields, value = template_rows[i % len(template_rows)]
+        prefix = re.match(r"[A-Z]*", data_point_id).group()
+        yield [f"{prefix}{i:07d}", *fields, perturb_value(value, rng)]
+
+
+def write_history_csv(path, rows, seed):
+    import csv
+
+    header, template_rows = read_template_rows(EXAMPLES_DIR / "dataset1.csv")
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(synthetic_rows(template_rows, rows, random.Random(seed)))
+
+
+def history_lines(count, rng):
+    _, template_rows = read_template_rows(EXAMPLES_DIR / "dataset1.csv")
+    for data_point_id, risk_type, name, description, value in synthetic_rows(template_rows, count, rng):
+        yield f"{data_point_id} {risk_type}: {name} = {value}. {description}."
+
+
+def write_pdf(path, pages):
+    """Write a minimal text-only PDF (Helvetica, one content stream per page)."""
+    def escape(text):
+        return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    page_count = len(pages)
+    # Objects: 1 catalog, 2 page tree, 3 font, then a (page, content) pair per page
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{4 + 2 * i} 0 R' for i in range(page_count))}] /Count {page_count} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, lines in enumerate(pages):
+        stream = "BT /F1 9 Tf 11 TL 40 800 Td " + " ".join(f"({escape(line[:110])}) Tj T*" for line in lines) + " ET"
+        stream = stream.encode("latin-1", "replace")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode())
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    Path(path).write_bytes(bytes(out))
+
+
+def write_docx(path, lines):
+    from docx import Document
+
+    document = Document()
+    document.add_heading("Procurement record", level=1)
+    for line in lines:
+        document.add_paragraph(line)
+    document.save(path)
+
+
+def build_corpus(workdir, rows, pdfs, docx_files, pages, seed):
+    folders = {name: Path(workdir) / name for name in ("historical_documents", "risks_document", "target_document")}
+    for folder in folders.values():
+        folder.mkdir(parents=True)
+
+    write_history_csv(folders["historical_documents"] / "history.csv", rows, seed)
+    rng = random.Random(seed)
+    for i in range(pdfs):
+        lines = list(history_lines(pages * LINES_PER_PAGE, rng))
+        write_pdf(folders["historical_documents"] / f"record_{i:04d}.pdf", [lines[p:p + LINES_PER_PAGE] for p in range(0, len(lines), LINES_PER_PAGE)])
+    for i in range(docx_files):
+        write_docx(folders["historical_documents"] / f"record_{i:04d}.docx", list(history_lines(pages * LINES_PER_PAGE, rng)))
+
+    (folders["risks_document"] / "risks.csv").write_bytes((EXAMPLES_DIR / "risks.csv").read_bytes())
+    (folders["target_document"] / "target.csv").write_bytes((EXAMPLES_DIR / "dataset_no_risks.csv").read_bytes())
+    return folders
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))]
+
+
+def stage_report(spans, rows):
+    stages = {}
+    for span in spans:
+        stages.setdefault(span["stage"], []).append(span)
+    report = {}
+    for stage, stage_spans in stages.items():
+        durations = [span["duration_ms"] for span in stage_spans]
+        total_seconds = sum(durations) / 1000
+        items = sum(span.get("documents", span.get("probes", 0)) for span in stage_spans)
+        report[stage] = {
+            "calls": len(stage_spans),
+            "p50_ms": percentile(durations, 50),
+            "p95_ms": percentile(durations, 95),
+            "total_ms": round(sum(durations), 1),
+            "items_per_second": round(items / total_seconds, 1) if items and total_seconds else None,
+            # RSS is a process high-water mark: the peak reached by the end of the stage
+            "peak_rss_mb": max(span.get("peak_rss_mb", 0) for span in stage_spans),
+        }
+    if "parse" in report and report["parse"]["total_ms"]:
+        report["parse"]["rows_per_second"] = round(rows / (report["parse"]["total_ms"] / 1000), 1)
+    return report
+
+
+def run_size(rows, args):
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from langchain_core.language_models import FakeListChatModel
+
+    from risk_analysis import RAGProcurementRisksAnalysis
+    from tracing import RunProfile
+
+    with tempfile.TemporaryDirectory() as workdir:
+        started = time.perf_counter()
+        folders = build_corpus(workdir, rows, args.pdfs, args.docx, args.pages, args.seed)
+        generate_seconds = time.perf_counter() - started
+
+        profile = RunProfile(emit=False, track_memory=True)
+        rag = RAGProcurementRisksAnalysis(
+            api_key="offline",
+            query=DEFAULT_QUERY,
+            historical_documents_folder_path=folders["historical_documents"],
+            risks_document_folder_path=folders["risks_document"],
+            target_document_folder_path=folders["target_document"],
+            risk_analysis_output_path=Path(workdir) / "outputs",
+            index_folder_path=Path(workdir) / "historical_index",
+            embedding_cache_path=Path(workdir) / "embedding_cache" / "embeddings.sqlite",
+            result_cache_path=Path(workdir) / "result_cache" / "results.sqlite",
+            revision_store_path=Path(workdir) / "result_cache" / "revisions.sqlite",
+            history_store_path=Path(workdir) / "history" / "analyses.sqlite",
+            extraction_cache_dir=Path(workdir) / "extraction_cache",
+            loader_workers=args.workers,
+            retrieval_mode=args.retrieval_mode,
+            analysis_mode=args.analysis_mode,
+            index_type=args.index_type,
+            profile=profile,
+            embeddings=DeterministicFakeEmbedding(size=EMBEDDING_SIZE) if args.embeddings == "fake" else None,
+            embeddings_backend="hashing",
+            llm=FakeListChatModel(responses=[CANNED_ANALYSIS]),
+        )
+
+        # The first analysis builds the indexes; later ones measure steady-state latency
+        latencies = []
+        for _ in range(args.repeat + 1):
+            run_started = time.perf_counter()
+            result = rag.generate_risks_analysis_rag(force_refresh=True)
+            latencies.append((time.perf_counter() - run_started) * 1000)
+            if result.startswith("Error:"):
+                return {"rows": rows, "error": result}
+
+        warm = latencies[1:] or latencies
+        return {
+            "rows": rows,
+            "pdfs": args.pdfs,
+            "docx": args.docx,
+            "historical_documents": len(rag.historical_documents),
+            "corpus_generation_seconds": round(generate_seconds, 2),
+            "cold_analysis_ms": round(latencies[0], 1),
+            "analysis_p50_ms": round(percentile(warm, 50), 1),
+            "analysis_p95_ms": round(percentile(warm, 95), 1),
+            "analyses_per_second": round(1000 / (sum(warm) / len(warm)), 2),
+            "stages": stage_report(profile.spans, rows),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline offline on synthetic corpora.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000], help="Historical CSV row counts to benchmark")
+    parser.add_argument("--pdfs", type=int, default=2, help="Generated historical PDFs per corpus")
+    parser.add_argument("--docx", type=int, default=2, help="Generated historical DOCX files per corpus")
+    parser.add_argument("--pages", type=int, default=5, help="Pages per generated PDF (and equivalent DOCX length)")
+    parser.add_argument("--repeat", type=int, default=5, help="Warm analyses per corpus after the cold one")
+    parser.add_argument("--workers", type=int, help="Loader processes for PDF/DOCX parsing")
+    parser.add_argument("--retrieval-mode", default="hybrid", choices=["hybrid", "dense", "lexical"])
+    parser.add_argument("--analysis-mode", default="single", choices=["single", "map_reduce"])
+    parser.add_argument("--index-type", default="flat", choices=["flat", "ivf", "hnsw", "ivfpq", "sqfp16"])
+    parser.add_argument("--embeddings", default="fake", choices=["fake", "hashing"], help="Random-but-deterministic vectors, or the local hashing backend")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="Also write the full report to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own logs")
+    args = parser.parse_args(argv)
+
+    results = []
+    for rows in args.rows:
+        # The pipeline prints prompt previews on every run, which would bury the report
+        with contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO()):
+            results.append(run_size(rows, args))
+
+    failures = 0
+    for result in results:
+        if "error" in result:
+            failures += 1
+            print(f"❌ {result['rows']} rows: {result['error']}")
+            continue
+        print(
+            f"⏱️ {result['rows']} rows ({result['historical_documents']} docs): cold {result['cold_analysis_ms']:.0f} ms, "
+            f"warm p50 {result['analysis_p50_ms']:.0f} ms / p95 {result['analysis_p95_ms']:.0f} ms, {result['analyses_per_second']} analyses/s"
+        )
+        print(f"    {'stage':<14}{'calls':>6}{'p50 ms':>11}{'p95 ms':>11}{'total ms':>12}{'per second':>12}{'peak RSS MB':>13}")
+        for stage, stats in result["stages"].items():
+            throughput = stats.get("rows_per_second") or stats["items_per_second"] or ""
+            print(f"    {stage:<14}{stats['calls']:>6}{stats['p50_ms']:>11.1f}{stats['p95_ms']:>11.1f}{stats['total_ms']:>12.1f}{throughput:>12}{stats['peak_rss_mb']:>13.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""Local BM25 inverted index over the historical corpus.
+
+It lives next to the FAISS store and uses the same content-hash document ids,
+so lexical and dense hits can be fused directly. Identifiers such as "R001",
+"SC002" or contract numbers survive tokenization intact. Searching needs no
+embedding call, which makes a lexical-only retrieval mode possible.
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+
+from vector_index import document_id
+
+BM25_FILE_NAME = "bm25.json"
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Keeps identifiers like "r001", "sc-002" or "2024.17" as single terms
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    def __init__(self):
+        self.postings = {}
+        self.doc_lengths = {}
+        self.documents = {}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, doc_id, page_content, metadata):
+        if doc_id in self.doc_lengths:
+            return
+        terms = tokenize(page_content)
+        for term in terms:
+            postings = self.postings.setdefault(term, {})
+            postings[doc_id] = postings.get(doc_id, 0) + 1
+        self.doc_lengths[doc_id] = len(terms)
+        self.total_length += len(terms)
+        self.documents[doc_id] = {"page_content": page_content, "metadata": metadata}
+
+    def remove(self, doc_id):
+        document = self.documents.pop(doc_id, None)
+        if document is None:
+            return
+        for term in set(tokenize(document["page_content"])):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id)
+
+    def search(self, query, k):
+        """Return up to ``k`` doc ids ranked by BM25 score for ``query``."""
+        if not self.doc_lengths:
+            return []
+        doc_count = len(self.doc_lengths)
+        average_length = self.total_length / doc_count or 1
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        return [doc_id for doc_id, _ in heapq.nlargest(k, scores.items(), key=lambda item: item[1])]
+
+    def get_document(self, doc_id):
+        from langchain.schema import Document as LCDocument
+
+        document = self.documents[doc_id]
+        return LCDocument(page_content=document["page_content"], metadata=document["metadata"])
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"postings": self.postings, "doc_lengths": self.doc_lengths, "documents": self.documents}, f, default=str)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index.postings = data["postings"]
+        index.doc_lengths = data["doc_lengths"]
+        index.documents = data["documents"]
+        index.total_length = sum(index.doc_lengths.values())
+        return index
+
+
+def sync_bm25_index(documents, index_folder_path):
+    docs_by_id = {}
+    for doc in documents:
+        docs_by_id.setdefault(document_id(doc), doc)
+
+    index_path = os.path.join(index_folder_path, BM25_FILE_NAME)
+    index = BM25Index()
+    if os.path.exists(index_path):
+        try:
+            index = BM25Index.load(index_path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Could not load BM25 index from {index_path}, rebuilding: {e}")
+
+    stale_ids = [doc_id for doc_id in index.documents if doc_id not in docs_by_id]
+    new_ids = [doc_id for doc_id in docs_by_id if doc_id not in index.documents]
+    for doc_id in stale_ids:
+        index.remove(doc_id)
+    for doc_id in new_ids:
+        index.add(doc_id, docs_by_id[doc_id].page_content, dict(docs_by_id[doc_id].metadata))
+
+    if new_ids or stale_ids:
+        os.makedirs(index_folder_path, exist_ok=True)
+        index.save(index_path)
+
+    print(f"🔤 BM25 sync: {len(new_ids)} added, {len(stale_ids)} removed, {len(index) - len(new_ids)} unchanged")
+    return index
@@ -0,0 +1,119 @@
+"""Token-budgeted packing of the risk-analysis prompt context.
+
+The budget is split across the target document, the risks document and the
+retrieved documents. Sections that need less than their share hand the rest to
+the others. Retrieved documents are kept in rank order, and oversized target or
+risks sections are truncated. Everything dropped is listed in the report.
+"""
+
+import functools
+
+DEFAULT_CONTEXT_TOKEN_BUDGET = 24000
+SECTION_SHARES = {"target": 0.4, "risks": 0.25, "retrieved": 0.35}
+TRUNCATION_NOTE = "\n[... truncated to fit the context budget ...]"
+
+
+@functools.lru_cache(maxsize=None)
+def load_encoding(model_name):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # tiktoken downloads its BPE files on first use, which fails offline
+        print(f"⚠️ Could not load a tiktoken encoding for {model_name!r}, estimating tokens instead: {e}")
+        return None
+
+
+class TokenCounter:
+    def __init__(self, model_name="gpt-4o"):
+        # Without tiktoken fall back to the usual ~4 characters per token estimate
+        self._encoding = load_encoding(model_name)
+
+    def count(self, text):
+        if self._encoding is None:
+            return (len(text) + 3) // 4
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text, max_tokens):
+        if self._encoding is None:
+            return text[:max_tokens * 4]
+        return self._encoding.decode(self._encoding.encode(text, disallowed_special=())[:max_tokens])
+
+
+def allocate_budget(demands, budget, shares=SECTION_SHARES):
+    """Split ``budget`` across sections by share, passing unused share on to the others."""
+    allocation = {}
+    open_sections = set(demands)
+    remaining = budget
+    while open_sections:
+        total_share = sum(shares[name] for name in open_sections)
+        fair = {name: remaining * shares[name] / total_share for name in open_sections}
+        satisfied = [name for name in open_sections if demands[name] <= fair[name]]
+        if not satisfied:
+            for name in open_sections:
+                allocation[name] = int(fair[name])
+            break
+        for name in satisfied:
+            allocation[name] = demands[name]
+            remaining -= demands[name]
+            open_sections.remove(name)
+    return allocation
+
+
+def pack_context(target_content, risks_content, retrieved_texts, budget=DEFAULT_CONTEXT_TOKEN_BUDGET, counter=None):
+    counter = counter or TokenCounter()
+    note_tokens = counter.count(TRUNCATION_NOTE)
+
+    retrieved_tokens = [counter.count(text) for text in retrieved_texts]
+    demands = {
+        "target": counter.count(target_content),
+        "risks": counter.count(risks_content),
+        "retrieved": sum(retrieved_tokens),
+    }
+    allocation = allocate_budget(demands, budget)
+    report = {"budget": budget, "sections": {}, "dropped": []}
+
+    # Highest-ranked documents first; a document that does not fit is skipped whole
+    kept_texts = []
+    kept_retrieved_tokens = 0
+    retrieved_left = allocation["retrieved"]
+    for rank, (text, tokens) in enumerate(zip(retrieved_texts, retrieved_tokens), start=1):
+        if tokens <= retrieved_left:
+            kept_texts.append(text)
+            kept_retrieved_tokens += tokens
+            retrieved_left -= tokens
+        else:
+            report["dropped"].append(f"retrieved document ranked {rank}: {tokens} tokens")
+    report["sections"]["retrieved"] = {
+        "kept_tokens": kept_retrieved_tokens,
+        "total_tokens": demands["retrieved"],
+        "kept_documents": len(kept_texts),
+        "total_documents": len(retrieved_texts),
+    }
+
+    # Room left by skipped documents goes to whichever of target/risks was cut
+    for name in ("target", "risks"):
+        extra = min(retrieved_left, max(demands[name] - allocation[name], 0))
+        allocation[name] += extra
+        retrieved_left -= extra
+
+    packed = {"retrieved": kept_texts}
+    for name, content in (("target", target_content), ("risks", risks_content)):
+        if demands[name] <= allocation[name]:
+            packed[name] = content
+            kept = demands[name]
+        else:
+            kept = max(allocation[name] - note_tokens, 0)
+            packed[name] = counter.truncate(content, kept) + TRUNCATION_NOTE
+            report["dropped"].append(f"{name} document: {demands[name] - kept} of {demands[name]} tokens")
+        report["sections"][name] = {"kept_tokens": kept, "total_tokens": demands[name]}
+
+    report["used_tokens"] = sum(section["kept_tokens"] for section in report["sections"].values())
+    packed["report"] = report
+    return packed
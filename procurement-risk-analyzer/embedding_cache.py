@@ -0,0 +1,154 @@
+"""Content-addressed embedding cache.
+
+Vectors are stored in a local SQLite database keyed by (model name, SHA-256 of
+the text). Repeated texts are served from disk without an embedding API call,
+and the least recently used vectors are evicted once the cache grows past its
+size limit.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+
+from langchain_core.embeddings import Embeddings
+
+# SQLite caps the number of bound parameters per statement
+SQLITE_BATCH_SIZE = 500
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, embeddings, cache_path="embedding_cache/embeddings.sqlite", max_bytes=512 * 1024 * 1024, model_name=None, token_counter=None):
+        self.embeddings = embeddings
+        self.model_name = model_name or getattr(embeddings, "model", type(embeddings).__name__)
+        self.max_bytes = max_bytes
+        # Anything with a count(text) method; used to report the tokens actually sent for embedding
+        self.token_counter = token_counter
+        self.hits = 0
+        self.misses = 0
+        self.embedded_tokens = 0
+        self._lock = threading.Lock()
+
+        cache_dir = os.path.dirname(str(cache_path))
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(str(cache_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    def embed_documents(self, texts):
+        keys = [text_hash(text) for text in texts]
+        cached = self._lookup(set(keys))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                missing.setdefault(key, text)
+
+        with self._lock:
+            self.hits += sum(1 for key in keys if key in cached)
+            self.misses += sum(1 for key in keys if key not in cached)
+
+        if missing:
+            if self.token_counter is not None:
+                tokens = sum(self.token_counter.count(text) for text in missing.values())
+                with self._lock:
+                    self.embedded_tokens += tokens
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self._store(fresh)
+            cached.update(fresh)
+
+        return [list(cached[key]) for key in keys]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "embedded_tokens": self.embedded_tokens,
+                "size_bytes": self._total_bytes,
+            }
+
+    def _lookup(self, keys):
+        found = {}
+        keys = list(keys)
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), SQLITE_BATCH_SIZE):
+                batch = keys[start:start + SQLITE_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [self.model_name, *batch],
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash IN ({placeholders})",
+                        [now, self.model_name, *batch],
+                    )
+            self._conn.commit()
+        return found
+
+    def _store(self, vectors):
+        now = time.time()
+        rows = []
+        for key, vector in vectors.items():
+            blob = array("f", vector).tobytes()
+            rows.append((self.model_name, key, blob, len(blob), now))
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, text_hash, vector, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            if self._conn.total_changes != before:
+                self._total_bytes += sum(row[3] for row in rows)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # Other processes may share the file, so re-read the real size before evicting
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        excess = self._total_bytes - self.max_bytes
+        if excess <= 0:
+            return
+
+        freed = 0
+        evicted = []
+        for rowid, size in self._conn.execute("SELECT rowid, size FROM embeddings ORDER BY last_used"):
+            if freed >= excess:
+                break
+            evicted.append((rowid,))
+            freed += size
+        self._conn.executemany("DELETE FROM embeddings WHERE rowid = ?", evicted)
+        self._total_bytes -= freed
+        print(f"🧹 Evicted {len(evicted)} cached embeddings ({freed} bytes)")
@@ -0,0 +1,22 @@
+"""Embedding backends selectable per deployment.
+
+"openai" calls the OpenAI embeddings API. "hashing" is a local CPU backend
+(see hashing_embeddings.py), so air-gapped sites can index and search history
+at local speed without network or API key. Backends are imported only when
+created.
+"""
+
+EMBEDDING_BACKENDS = ("openai", "hashing")
+
+
+def create_embeddings_backend(backend, api_key=None):
+    if backend == "openai":
+        from openai_client import create_openai_embeddings
+
+        # Pooled, rate-limited client shared with the chat model
+        return create_openai_embeddings(api_key)
+    if backend == "hashing":
+        from hashing_embeddings import HashingEmbeddings
+
+        return HashingEmbeddings()
+    raise ValueError(f"Unknown embeddings backend {backend!r}; expected one of {EMBEDDING_BACKENDS}")
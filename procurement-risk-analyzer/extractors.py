@@ -0,0 +1,216 @@
+"""Text extraction for PDF and DOCX files.
+
+PyPDF2 and python-docx are tried first. unstructured is only used when the
+lightweight path yields no usable text (scanned or table-heavy files).
+Extracted pages are cached on disk by file hash, so the upload preview and the
+analysis share a single parse. Each caller picks its cache folder; the least
+recently used files are evicted once a folder grows past its size cap. Upload
+previews use ``extract_preview``, which reads only the first pages.
+"""
+
+import hashlib
+import io
+import json
+import os
+import tempfile
+
+EXTRACTION_CACHE_DIR = "extraction_cache"
+EXTRACTION_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Below this many characters the fast path is treated as having found no text
+MIN_USABLE_CHARS = 50
+HASH_BLOCK_SIZE = 1024 * 1024
+PREVIEW_PAGES = 2
+PREVIEW_CHARS = 2000
+# Page attributes a PDF page may inherit from its parent page-tree nodes
+INHERITABLE_PAGE_KEYS = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+
+
+def file_hash(source):
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray)):
+        digest.update(source)
+    elif hasattr(source, "read"):
+        source.seek(0)
+        for block in iter(lambda: source.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+        source.seek(0)
+    else:
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def extract_text(source, file_type, cache_dir=EXTRACTION_CACHE_DIR, max_bytes=EXTRACTION_CACHE_MAX_BYTES):
+    """Extract the pages of a PDF/DOCX given as a path, bytes or binary stream.
+
+    Returns ``{"extractor": name, "pages": [{"text", "page_number"}, ...]}``.
+    """
+    cache_path = os.path.join(cache_dir, f"{file_hash(source)}.json")
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                extracted = json.load(f)
+            # The modification time doubles as the last-used time for eviction
+            os.utime(cache_path)
+            return extracted
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable extraction cache {cache_path}: {e}")
+
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+
+    extracted = _extract_fast(source, file_type)
+    if sum(len(page["text"].strip()) for page in extracted["pages"]) < MIN_USABLE_CHARS:
+        extracted = _extract_unstructured(source, file_type)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    # Written atomically because loader processes may extract the same file concurrently
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(extracted, f)
+    os.replace(tmp_path, cache_path)
+    evict_extractions(cache_dir, max_bytes)
+    return extracted
+
+
+def evict_extractions(cache_dir, max_bytes):
+    # Other processes may share the folder, so sizes are read from disk each time
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if not entry.name.endswith(".json"):
+            continue
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+    excess = sum(size for _, size, _ in entries) - max_bytes
+    if excess <= 0:
+        return
+
+    freed = 0
+    evicted = 0
+    for _, size, path in sorted(entries):
+        if freed >= excess:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        freed += size
+        evicted += 1
+    print(f"🧹 Evicted {evicted} cached extractions ({freed} bytes)")
+
+
+def extract_preview(source, file_type, max_pages=PREVIEW_PAGES, max_chars=PREVIEW_CHARS):
+    """Text of the first pages of a PDF/DOCX binary stream, for upload previews.
+
+    Unlike ``extract_text`` the file is neither hashed nor parsed in full:
+    PyPDF2 loads only the pages it is asked for, each page's text is extracted
+    once, and reading stops at ``max_chars``.
+    """
+    source.seek(0)
+    texts = []
+    chars = 0
+    try:
+        if file_type == "pdf":
+            from PyPDF2 import PdfReader
+
+            for page in _leading_pdf_pages(PdfReader(source), max_pages):
+                text = page.extract_text() or ""
+                if text:
+                    texts.append(text)
+                    chars += len(text)
+                if chars >= max_chars:
+                    break
+        elif file_type == "docx":
+            from docx import Document
+
+            # python-docx parses the document body up front; only the paragraphs shown are joined
+            for paragraph in Document(source).paragraphs:
+                texts.append(paragraph.text)
+                chars += len(paragraph.text) + 1
+                if chars >= max_chars:
+                    break
+    except Exception as e:
+        print(f"⚠️ Could not preview {file_type} upload: {e}")
+    return "\n".join(texts)[:max_chars]
+
+
+def _leading_pdf_pages(reader, count):
+    """The first ``count`` pages, walking the page tree only as far as needed.
+
+    ``reader.pages`` resolves every page object of the document first, which
+    takes seconds on a large file.
+    """
+    from PyPDF2 import PageObject
+    from PyPDF2.generic import NameObject
+
+    pages = []
+
+    def walk(node, inherited):
+        inherited = {**inherited, **{key: node.raw_get(key) for key in INHERITABLE_PAGE_KEYS if key in node}}
+        for reference in node["/Kids"]:
+            if len(pages) >= count:
+                return
+            kid = reference.get_object()
+            if "/Kids" in kid:
+                walk(kid, inherited)
+                continue
+            page = PageObject(reader, reference)
+            page.update(kid)
+            for key, value in inherited.items():
+                if key not in page:
+                    page[NameObject(key)] = value
+            pages.append(page)
+
+    try:
+        walk(reader.trailer["/Root"]["/Pages"], {})
+    except Exception:
+        # Unusual page trees get PyPDF2's own (full) traversal
+        return list(reader.pages[:count])
+    return pages
+
+
+def _extract_fast(source, file_type):
+    if hasattr(source, "seek"):
+        source.seek(0)
+    try:
+        if file_type == "pdf":
+            from PyPDF2 import PdfReader
+
+            reader = PdfReader(source)
+            pages = [{"text": page.extract_text() or "", "page_number": number} for number, page in enumerate(reader.pages, start=1)]
+            return {"extractor": "pypdf2", "pages": pages}
+        if file_type == "docx":
+            from docx import Document
+
+            doc = Document(source)
+            lines = [p.text for p in doc.paragraphs]
+            for table in doc.tables:
+                for row in table.rows:
+                    lines.append(" | ".join(cell.text for cell in row.cells))
+            return {"extractor": "python-docx", "pages": [{"text": "\n".join(lines), "page_number": 1}]}
+    except Exception as e:
+        print(f"⚠️ Fast {file_type} extraction failed, falling back to unstructured: {e}")
+    return {"extractor": "none", "pages": []}
+
+
+def _extract_unstructured(source, file_type):
+    from langchain_unstructured import UnstructuredLoader
+
+    if hasattr(source, "read"):
+        # unstructured needs a real path, so streams are spilled to a temp file
+        source.seek(0)
+        with tempfile.NamedTemporaryFile(suffix=f".{file_type}", delete=False) as tmp:
+            tmp.write(source.read())
+        try:
+            documents = UnstructuredLoader(file_path=tmp.name).load()
+        finally:
+            os.remove(tmp.name)
+    else:
+        documents = UnstructuredLoader(file_path=str(source)).load()
+
+    pages = [{"text": doc.page_content, "page_number": doc.metadata.get("page_number")} for doc in documents]
+    return {"extractor": "unstructured", "pages": pages}
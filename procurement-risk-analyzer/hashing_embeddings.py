@@ -0,0 +1,64 @@
+"""Local feature-hashing embeddings.
+
+A signed hashing vectorizer over word unigrams and bigrams, computed in NumPy
+batches. It needs no network and no API key, and gives the same vectors in
+every process and on every machine.
+"""
+
+import zlib
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from bm25_index import tokenize
+
+HASHING_FEATURES = 1024
+HASHING_BATCH_SIZE = 512
+# Term -> feature lookups are memoized; the memo is reset once it holds this many terms
+FEATURE_CACHE_SIZE = 1_000_000
+
+
+class HashingEmbeddings(Embeddings):
+    def __init__(self, n_features=HASHING_FEATURES, batch_size=HASHING_BATCH_SIZE):
+        self.n_features = n_features
+        self.batch_size = batch_size
+        # Used as the model name by the embedding cache and the index config
+        self.model = f"hashing-{n_features}"
+        self._feature_cache = {}
+
+    def _feature(self, term):
+        feature = self._feature_cache.get(term)
+        if feature is None:
+            # crc32 rather than hash(), which is salted per process
+            digest = zlib.crc32(term.encode("utf-8"))
+            feature = (digest % self.n_features, 1.0 if digest & 0x80000000 else -1.0)
+            if len(self._feature_cache) >= FEATURE_CACHE_SIZE:
+                self._feature_cache.clear()
+            self._feature_cache[term] = feature
+        return feature
+
+    def _embed_batch(self, texts):
+        rows, columns, signs = [], [], []
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            for term in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+                column, sign = self._feature(term)
+                rows.append(row)
+                columns.append(column)
+                signs.append(sign)
+
+        vectors = np.zeros((len(texts), self.n_features), dtype=np.float32)
+        np.add.at(vectors, (np.asarray(rows, dtype=np.intp), np.asarray(columns, dtype=np.intp)), np.asarray(signs, dtype=np.float32))
+        # Sublinear term frequency, then unit length so L2 distance ranks like cosine
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors
+
+    def embed_documents(self, texts):
+        batches = [self._embed_batch(texts[start:start + self.batch_size]) for start in range(0, len(texts), self.batch_size)]
+        if not batches:
+            return []
+        return np.vstack(batches).tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
@@ -0,0 +1,324 @@
+"""Indexed store of every finished analysis, for portfolio views and exports.
+
+Each analysis is kept in SQLite with its target id, timestamp, model, mode and
+deterministic metrics. The LLM answer is also parsed into one row per assessed
+risk (risk type, label, severity, register score) and one row per mitigation
+item. Risks are indexed on risk type and date, so portfolio summaries over tens
+of thousands of past analyses come straight from the index without re-running
+anything. Any filtered slice exports to Parquet, Excel or JSON.
+"""
+
+import io
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+EXPORT_FORMATS = ("parquet", "xlsx", "json")
+SEVERITY_PATTERN = re.compile(r"\b(critical|high|medium|moderate|low)\b", re.IGNORECASE)
+SEVERITIES = {"critical": "High", "high": "High", "medium": "Medium", "moderate": "Medium", "low": "Low"}
+HEADING_PATTERN = re.compile(r"^\s*#{1,6}\s*(.+?)\s*$")
+BULLET_PATTERN = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+MAX_LABEL_CHARS = 120
+# "- **Label:** High" style sub-items that give a risk's severity or explanation
+SEVERITY_FIELDS = ("label", "risk label", "severity", "risk level", "level", "rating")
+EXPLANATION_FIELDS = ("explanation", "description", "rationale", "reason", "details")
+
+
+def match_risk_type(text, risk_types):
+    """The register risk type a line is about: the earliest one it names."""
+    lowered = text.lower()
+    found = [(lowered.find(risk_type.lower()), risk_type) for risk_type in risk_types if risk_type.lower() in lowered]
+    if found:
+        return min(found)[1]
+    # "Schedule: ..." for "Schedule Risk", but only at the start of a line
+    for risk_type in risk_types:
+        short_name = risk_type.lower().removesuffix(" risk")
+        if short_name != risk_type.lower() and lowered.lstrip("*_ ").startswith(short_name):
+            return risk_type
+    return None
+
+
+def parse_analysis(text, risk_types=()):
+    """Split an analysis into ``(risks, mitigations)`` lists of dicts.
+
+    A risk starts at each bullet of the assessment, at each line that names a
+    register risk type, and at the first line under a ``#### Risk Type``
+    heading (per-category analyses), whose lines belong to that type. Lines
+    directly below a risk, or indented under it, continue it; other prose is
+    skipped, even when it mentions a severity. Sub-bullets such as
+    ``- **Label:** High`` and ``- **Explanation:** ...`` fill in the severity
+    and explanation of the risk above them.
+    """
+    assessment, _, mitigation = text.partition("Mitigation Plan:")
+    assessment = assessment.replace("Risk Assessment:", "", 1)
+
+    risks = []
+    heading_type = None
+    block_start = 0
+    continues_risk = False
+    risk_indent = 0
+    bare_risk = False
+    for line in assessment.splitlines():
+        heading = HEADING_PATTERN.match(line)
+        if heading:
+            heading_type = match_risk_type(heading.group(1), risk_types) or heading.group(1)
+            block_start = len(risks)
+            continues_risk = False
+            continue
+        is_bullet = BULLET_PATTERN.match(line) is not None
+        item = BULLET_PATTERN.sub("", line).strip()
+        if not item:
+            # A blank line ends the current risk unless the next line is indented under it
+            continues_risk = False
+            continue
+        indent = len(line) - len(line.lstrip())
+        field, has_field, value = item.partition(":")
+        field = field.strip("*_ ").lower()
+        value = value.strip("*_ ")
+        has_parent = len(risks) > block_start and (continues_risk or indent > 0)
+        if has_parent and is_bullet and (indent > risk_indent or (has_field and field in SEVERITY_FIELDS + EXPLANATION_FIELDS)):
+            risk = risks[-1]
+            severity = SEVERITY_PATTERN.search(value) if has_field and field in SEVERITY_FIELDS else None
+            if severity:
+                risk["severity"] = risk["severity"] or SEVERITIES[severity.group(1).lower()]
+            else:
+                detail = value if has_field and field in EXPLANATION_FIELDS else item
+                risk["explanation"] = detail if bare_risk else f"{risk['explanation']} {detail}".strip()
+                bare_risk = False
+            continues_risk = True
+            continue
+        risk_type = match_risk_type(item, risk_types)
+        severity = SEVERITY_PATTERN.search(item)
+        starts_risk = is_bullet or risk_type or (heading_type and len(risks) == block_start)
+        if not starts_risk:
+            if has_parent:
+                risks[-1]["explanation"] = item if bare_risk else f"{risks[-1]['explanation']} {item}".strip()
+                bare_risk = False
+                continues_risk = True
+            # Otherwise introductory or closing prose rather than a risk
+            continue
+        if not (risk_type or heading_type or severity):
+            continue
+        label, _, explanation = item.partition(":")
+        explanation = explanation.strip("*_ ")
+        risks.append({
+            "risk_type": risk_type or heading_type,
+            "label": label.strip("*_ ")[:MAX_LABEL_CHARS],
+            "severity": SEVERITIES[severity.group(1).lower()] if severity else None,
+            "explanation": explanation or item,
+        })
+        # A bare "1. **Schedule Risk**" line is replaced by the explanation that follows it
+        bare_risk = not explanation
+        continues_risk = True
+        risk_indent = indent
+
+    mitigations = []
+    heading_type = None
+    for line in mitigation.splitlines():
+        heading = HEADING_PATTERN.match(line)
+        if heading:
+            heading_type = match_risk_type(heading.group(1), risk_types) or heading.group(1)
+            continue
+        item = BULLET_PATTERN.sub("", line).strip()
+        if item:
+            mitigations.append({"risk_type": match_risk_type(item, risk_types) or heading_type, "item": item})
+    # Mitigation lines that name no known risk type are kept, untyped
+    return risks, mitigations
+
+
+def nest_by_analysis(frame):
+    nested = {}
+    for record in frame.to_dict("records"):
+        nested.setdefault(record.pop("analysis_id"), []).append(record)
+    return nested
+
+
+class AnalysisHistory:
+    def __init__(self, store_path="history/analyses.sqlite"):
+        self._lock = threading.RLock()
+
+        store_dir = os.path.dirname(str(store_path))
+        if store_dir:
+            os.makedirs(store_dir, exist_ok=True)
+        self._conn = sqlite3.connect(str(store_path), check_same_thread=False, timeout=30)
+        # Readers (the dashboard) never block the jobs that write new analyses
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS analyses (
+                id INTEGER PRIMARY KEY,
+                target_id TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                run_id TEXT,
+                query TEXT,
+                model TEXT,
+                analysis_mode TEXT,
+                risk_score INTEGER,
+                risk_score_label TEXT,
+                schedule_variance_days INTEGER,
+                cost_variance REAL,
+                result TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS risks (
+                analysis_id INTEGER NOT NULL REFERENCES analyses (id),
+                target_id TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                risk_type TEXT,
+                label TEXT,
+                severity TEXT,
+                register_score INTEGER,
+                explanation TEXT
+            );
+            CREATE TABLE IF NOT EXISTS mitigations (
+                analysis_id INTEGER NOT NULL REFERENCES analyses (id),
+                risk_type TEXT,
+                item TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_analyses_created_at ON analyses (created_at);
+            CREATE INDEX IF NOT EXISTS idx_analyses_target ON analyses (target_id, created_at);
+            -- Covering indexes: portfolio queries by risk type or by date never touch the table itself
+            CREATE INDEX IF NOT EXISTS idx_risks_type ON risks (risk_type, severity, analysis_id, target_id, register_score, created_at);
+            CREATE INDEX IF NOT EXISTS idx_risks_date ON risks (created_at, risk_type, severity, analysis_id, target_id, register_score);
+            CREATE INDEX IF NOT EXISTS idx_risks_analysis ON risks (analysis_id);
+            CREATE INDEX IF NOT EXISTS idx_mitigations_analysis ON mitigations (analysis_id);"""
+        )
+        self._conn.commit()
+
+    def record(self, target_id, result, category_scores=None, metrics=None, run_id=None, query=None, model=None, analysis_mode=None, created_at=None):
+        """Parse and store one analysis; returns its id."""
+        category_scores = category_scores or {}
+        metrics = metrics or {}
+        created_at = created_at or time.time()
+        risks, mitigations = parse_analysis(result, list(category_scores))
+        with self._lock:
+            cursor = self._conn.execute(
+                """INSERT INTO analyses (target_id, created_at, run_id, query, model, analysis_mode, risk_score, risk_score_label, schedule_variance_days, cost_variance, result)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (target_id, created_at, run_id, query, model, analysis_mode, metrics.get("risk_score"), metrics.get("risk_score_label"), metrics.get("schedule_variance_days"), metrics.get("cost_variance"), result),
+            )
+            analysis_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO risks (analysis_id, target_id, created_at, risk_type, label, severity, register_score, explanation) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(analysis_id, target_id, created_at, risk["risk_type"], risk["label"], risk["severity"], category_scores.get(risk["risk_type"]), risk["explanation"]) for risk in risks],
+            )
+            self._conn.executemany(
+                "INSERT INTO mitigations (analysis_id, risk_type, item) VALUES (?, ?, ?)",
+                [(analysis_id, mitigation["risk_type"], mitigation["item"]) for mitigation in mitigations],
+            )
+            self._conn.commit()
+        return analysis_id
+
+    def find(self, target_id, result):
+        """Id of the latest stored analysis of ``target_id`` with this exact answer, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM analyses WHERE target_id = ? AND result = ? ORDER BY created_at DESC LIMIT 1",
+                (target_id, result),
+            ).fetchone()
+        return row[0] if row else None
+
+    def _risk_filter(self, risk_types=None, severities=None, since=None, until=None):
+        clauses, params = [], []
+        if risk_types:
+            clauses.append(f"risk_type IN ({', '.join('?' * len(risk_types))})")
+            params.extend(risk_types)
+        if severities:
+            clauses.append(f"severity IN ({', '.join('?' * len(severities))})")
+            params.extend(severities)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _query(self, sql, params=()):
+        import pandas as pd
+
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=list(params))
+
+    def portfolio(self, risk_types=None, severities=None, since=None, until=None):
+        """Risks per type and severity: how many analyses and targets raised them, and when last."""
+        where, params = self._risk_filter(risk_types, severities, since, until)
+        return self._query(
+            f"""SELECT risk_type, severity, COUNT(DISTINCT analysis_id) AS analyses,
+                COUNT(DISTINCT target_id) AS targets, MAX(register_score) AS register_score,
+                datetime(MAX(created_at), 'unixepoch') AS last_seen
+            FROM risks{where}
+            GROUP BY risk_type, severity
+            ORDER BY analyses DESC""",
+            params,
+        )
+
+    def risk_types(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT risk_type FROM risks WHERE risk_type IS NOT NULL ORDER BY risk_type")]
+
+    def analysis_ids(self, risk_types=None, severities=None, since=None, until=None, limit=None):
+        """Ids of the analyses matching the filters, newest first."""
+        if not (risk_types or severities):
+            clauses = [clause for clause, value in (("created_at >= ?", since), ("created_at < ?", until)) if value is not None]
+            sql = "SELECT id FROM analyses" + (" WHERE " + " AND ".join(clauses) if clauses else "") + " ORDER BY created_at DESC"
+            params = [value for value in (since, until) if value is not None]
+        else:
+            where, params = self._risk_filter(risk_types, severities, since, until)
+            sql = f"SELECT analysis_id FROM risks{where} GROUP BY analysis_id ORDER BY MAX(created_at) DESC"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            return [row[0] for row in self._conn.execute(sql, params)]
+
+    def tables(self, analysis_ids):
+        """``{"analyses", "risks", "mitigations"}`` DataFrames for the given analyses."""
+        import pandas as pd
+
+        with self._lock:
+            # Ids go through a temp table rather than an IN list, which SQLite caps in length
+            self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS selected (id INTEGER PRIMARY KEY)")
+            self._conn.execute("DELETE FROM selected")
+            self._conn.executemany("INSERT OR IGNORE INTO selected (id) VALUES (?)", [(analysis_id,) for analysis_id in analysis_ids])
+            frames = {
+                "analyses": self._query("SELECT analyses.* FROM analyses JOIN selected ON selected.id = analyses.id ORDER BY created_at DESC"),
+                # CROSS JOIN keeps the (small) selection as the outer loop, so risks and mitigations are read by index
+                "risks": self._query("SELECT risks.* FROM selected CROSS JOIN risks ON risks.analysis_id = selected.id"),
+                "mitigations": self._query("SELECT mitigations.* FROM selected CROSS JOIN mitigations ON mitigations.analysis_id = selected.id"),
+            }
+
+        for frame in frames.values():
+            if "created_at" in frame:
+                frame["created_at"] = pd.to_datetime(frame["created_at"], unit="s")
+        frames["risks"]["register_score"] = frames["risks"]["register_score"].astype("Int64")
+        return frames
+
+    def export(self, export_format, analysis_ids):
+        """The given analyses as Parquet, Excel or JSON bytes."""
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format {export_format!r}; expected one of {EXPORT_FORMATS}")
+        frames = self.tables(analysis_ids)
+        buffer = io.BytesIO()
+        if export_format == "xlsx":
+            import pandas as pd
+
+            # One sheet per table; needs openpyxl
+            with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+                for name, frame in frames.items():
+                    frame.to_excel(writer, sheet_name=name, index=False)
+            return buffer.getvalue()
+
+        # Parquet and JSON carry one record per analysis with its risks and mitigations nested
+        risks_by_analysis = nest_by_analysis(frames["risks"].drop(columns=["target_id", "created_at"]))
+        mitigations_by_analysis = nest_by_analysis(frames["mitigations"])
+        analyses = frames["analyses"].assign(
+            risks=[risks_by_analysis.get(analysis_id, []) for analysis_id in frames["analyses"]["id"]],
+            mitigations=[mitigations_by_analysis.get(analysis_id, []) for analysis_id in frames["analyses"]["id"]],
+        )
+        if export_format == "parquet":
+            # Needs pyarrow
+            analyses.to_parquet(buffer, index=False)
+            return buffer.getvalue()
+        records = json.loads(analyses.to_json(orient="records", date_format="iso"))
+        return json.dumps(records, indent=2).encode("utf-8")
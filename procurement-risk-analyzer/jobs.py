@@ -0,0 +1,252 @@
+"""Background analysis jobs for the web apps.
+
+An analysis is submitted to a worker pool and gets a job id instead of running
+inside the Streamlit script, so it survives reruns, widget changes and page
+refreshes. A job reports its stage (loading, embedding, retrieving,
+generating) and the text generated so far, and can be cancelled between stages
+or mid-stream. Job state is written to one JSON file per id, so a finished
+result can be fetched again after a refresh or a server restart. All jobs
+share one cap on concurrent LLM calls and one persistent historical index, and
+parsed uploads are cached per process by content hash.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+JOB_STAGES = ("queued", "loading", "embedding", "retrieving", "generating", "done")
+# Profile spans map onto the coarser stages shown to the user
+SPAN_STAGES = {
+    "load": "loading",
+    "parse": "loading",
+    "embed": "embedding",
+    "index": "embedding",
+    "score": "retrieving",
+    "revision_diff": "retrieving",
+    "search": "retrieving",
+    "result_cache": "retrieving",
+    "pack": "generating",
+    "prompt": "generating",
+    "llm": "generating",
+}
+ACTIVE_STATUSES = ("queued", "running")
+# Job ids come back from the page URL, so only ids this module could have made are accepted
+JOB_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+INDEX_FOLDER = "historical_index"
+UPLOAD_CACHE_ENTRIES = 256
+
+_index_lock = threading.Lock()
+_upload_cache = OrderedDict()
+_upload_cache_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, job_id, llm_slots):
+        self.id = job_id
+        self.llm_slots = llm_slots
+        self.stage = "queued"
+        self.tokens = []
+        self.cancel_requested = threading.Event()
+
+    def check_cancelled(self):
+        if self.cancel_requested.is_set():
+            raise JobCancelled(self.id)
+
+    def on_span(self, stage):
+        # Every profile span start doubles as a cancellation point
+        self.check_cancelled()
+        self.stage = SPAN_STAGES.get(stage, self.stage)
+
+    def on_token(self, token):
+        self.check_cancelled()
+        self.tokens.append(token)
+
+
+class JobManager:
+    def __init__(self, jobs_dir="analysis_jobs", max_workers=2, max_concurrent_llm_calls=4):
+        self.jobs_dir = Path(jobs_dir)
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis-job")
+        # Shared by every job, so a burst of submissions cannot exceed the provider's concurrency
+        self.llm_slots = threading.BoundedSemaphore(max_concurrent_llm_calls)
+        # Only queued and running jobs are held in memory; finished ones are read back from disk
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _path(self, job_id):
+        return self.jobs_dir / f"{job_id}.json"
+
+    def _save(self, state):
+        path = self._path(state["id"])
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, default=str)
+        # Readers never see a half-written file
+        os.replace(tmp_path, path)
+
+    def _update(self, job_id, **changes):
+        with self._lock:
+            job, state, future = self._jobs[job_id]
+            state.update(changes, updated_at=time.time())
+            snapshot = dict(state)
+            if snapshot["status"] not in ACTIVE_STATUSES:
+                del self._jobs[job_id]
+        self._save(snapshot)
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(job, *args, **kwargs); its JSON-serializable return value becomes the job result."""
+        job = Job(uuid.uuid4().hex, self.llm_slots)
+        now = time.time()
+        state = {"id": job.id, "status": "queued", "stage": "queued", "created_at": now, "updated_at": now, "error": None, "result": None}
+        self._save(state)
+        with self._lock:
+            self._jobs[job.id] = (job, state, None)
+            future = self._executor.submit(self._run, job, fn, args, kwargs)
+            self._jobs[job.id] = (job, state, future)
+        print(f"📥 Queued analysis job {job.id}")
+        return job.id
+
+    def _run(self, job, fn, args, kwargs):
+        if job.cancel_requested.is_set():
+            # Cancelled after the pool picked it up but before it ran
+            self._update(job.id, status="cancelled")
+            return
+        job.stage = "loading"
+        self._update(job.id, status="running", stage="loading")
+        try:
+            result = fn(job, *args, **kwargs)
+        except JobCancelled:
+            print(f"🛑 Cancelled analysis job {job.id}")
+            self._update(job.id, status="cancelled", stage=job.stage)
+        except Exception as e:
+            print(f"❌ Analysis job {job.id} failed: {e}")
+            self._update(job.id, status="failed", stage=job.stage, error=str(e))
+        else:
+            print(f"✅ Finished analysis job {job.id}")
+            self._update(job.id, status="succeeded", stage="done", result=result)
+
+    def get(self, job_id):
+        """Current state of a job, or None for an unknown id."""
+        if not JOB_ID_PATTERN.fullmatch(job_id or ""):
+            return None
+        with self._lock:
+            live = self._jobs.get(job_id)
+            if live is not None:
+                job, state, future = live
+                snapshot = dict(state, stage=job.stage if state["status"] == "running" else state["stage"])
+                snapshot["partial_text"] = "".join(job.tokens)
+                return snapshot
+        try:
+            with open(self._path(job_id)) as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return None
+        if snapshot["status"] in ACTIVE_STATUSES:
+            # Left behind by a server process that stopped before the job finished
+            snapshot["status"] = "interrupted"
+        return snapshot
+
+    def cancel(self, job_id):
+        with self._lock:
+            live = self._jobs.get(job_id)
+        if live is None:
+            return False
+        job, state, future = live
+        job.cancel_requested.set()
+        if future.cancel():
+            # Never started, so no worker will record the cancellation
+            self._update(job_id, status="cancelled")
+        return True
+
+
+def load_uploads(uploads, csv_rows_per_chunk=None):
+    """Documents of in-memory ``(name, bytes)`` uploads, in order.
+
+    Parsed documents are kept per process, keyed by name and content hash, so
+    jobs re-submitting the same files skip the parse. Uploads that failed to
+    load are not cached and are retried next time.
+    """
+    from extractors import file_hash
+    from loaders import load_files
+
+    keys = [(name, file_hash(data), csv_rows_per_chunk) for name, data in uploads]
+    with _upload_cache_lock:
+        loaded = {key: _upload_cache[key] for key in keys if key in _upload_cache}
+        for key in loaded:
+            _upload_cache.move_to_end(key)
+    missing = [upload for upload, key in zip(uploads, keys) if key not in loaded]
+    if missing:
+        by_source = {}
+        for doc in load_files(missing, csv_rows_per_chunk=csv_rows_per_chunk):
+            by_source.setdefault(doc.metadata["source"], []).append(doc)
+        with _upload_cache_lock:
+            for (name, _), key in zip(uploads, keys):
+                if key not in loaded and name in by_source:
+                    loaded[key] = _upload_cache[key] = by_source[name]
+            while len(_upload_cache) > UPLOAD_CACHE_ENTRIES:
+                _upload_cache.popitem(last=False)
+    return [doc for key in keys for doc in loaded.get(key, [])]
+
+
+def run_analysis(job, historical_uploads, risks_upload, target_upload, force_refresh=False, index_folder_path=INDEX_FOLDER, **rag_options):
+    """Job body for one analysis of in-memory (name, bytes) uploads.
+
+    Returns the analysis text together with everything the apps render next to
+    it, so a finished job can be shown again without re-running anything.
+    """
+    from loaders import CSV_ROWS_PER_CHUNK
+    from risk_analysis import RAGProcurementRisksAnalysis
+    from tracing import RunProfile
+
+    profile = RunProfile(on_start=job.on_span)
+    with profile.span("parse", files=len(historical_uploads) + 2, source="upload") as span:
+        historical_documents = load_uploads(historical_uploads, csv_rows_per_chunk=CSV_ROWS_PER_CHUNK)
+        risks_document = load_uploads([risks_upload])
+        target_document = load_uploads([target_upload])
+        span["documents"] = len(historical_documents) + len(risks_document) + len(target_document)
+    if not historical_documents:
+        raise ValueError("Could not load any content from historical documents.")
+    if not risks_document:
+        raise ValueError("Could not load any content from the risks document.")
+    if not target_document:
+        raise ValueError("Could not load any content from the target document.")
+
+    rag = RAGProcurementRisksAnalysis(
+        historical_documents=historical_documents,
+        risks_document=risks_document,
+        target_document=target_document,
+        index_folder_path=index_folder_path,
+        profile=profile,
+        llm_slots=job.llm_slots,
+        **rag_options,
+    )
+    # Jobs sync the one persistent index to their history one at a time, then search their own copy in memory
+    with _index_lock:
+        if rag.retrieval_mode != "lexical":
+            rag.create_embeddings()
+        if rag.retrieval_mode != "dense":
+            rag.create_lexical_index()
+    text = rag.generate_risks_analysis_rag(on_token=job.on_token, force_refresh=force_refresh)
+    return {
+        "text": text,
+        "risks_documents": len(rag.risks_document),
+        "risks_preview": rag.risks_content[:300],
+        "risk_metrics": rag.risk_metrics,
+        "context_report": rag.context_report,
+        "result_cache_hit": rag.result_cache_hit,
+        "embedding_cache_stats": rag.embedding_cache_stats,
+        "revision_changes": rag.revision_changes,
+        "reanalyzed_categories": rag.reanalyzed_categories,
+        "history_id": rag.history_id,
+        "profile": {"summary": profile.summary(), "spans": profile.spans},
+    }
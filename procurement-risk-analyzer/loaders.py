@@ -0,0 +1,271 @@
+"""Document loaders for the risk analysis pipeline."""
+
+import atexit
+import codecs
+import concurrent.futures
+import csv
+import io
+import os
+import pickle
+import queue
+import subprocess
+import sys
+import threading
+
+from extractors import EXTRACTION_CACHE_DIR, extract_text
+
+# Historical CSVs are split into groups of rows so retrieval can return the rows that matter
+CSV_ROWS_PER_CHUNK = 20
+ENCODING_PROBE_BLOCK_SIZE = 1024 * 1024
+ID_COLUMNS = ("Data Point ID", "Risk ID")
+RISK_TYPE_COLUMN = "Risk Type"
+# Upper bound for parsing a single PDF/DOCX, in-process or in a worker
+LOADER_FILE_TIMEOUT = 300
+# Files up to this size are parsed in-process rather than shipped to a worker
+INPROCESS_PARSE_BYTES = 256 * 1024
+PARSE_WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "parse_worker.py")
+
+
+def source_name(source):
+    """File name of a path or of an in-memory ``(name, bytes)`` upload."""
+    return str(source[0]) if isinstance(source, tuple) else str(source)
+
+
+def open_text(source):
+    if isinstance(source, tuple):
+        data = source[1]
+        try:
+            text = data.decode("utf-8")
+        except UnicodeDecodeError:
+            text = data.decode("latin1")
+        return io.StringIO(text, newline="")
+    return open(source, "r", encoding=detect_encoding(source), newline="")
+
+
+def detect_encoding(file_path):
+    # Validate UTF-8 block by block so large files never have to fit in memory
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    with open(file_path, "rb") as f:
+        try:
+            while True:
+                block = f.read(ENCODING_PROBE_BLOCK_SIZE)
+                if not block:
+                    decoder.decode(b"", final=True)
+                    return "utf-8"
+                decoder.decode(block)
+        except UnicodeDecodeError:
+            return "latin1"
+
+
+def iter_csv_documents(source, rows_per_chunk=CSV_ROWS_PER_CHUNK):
+    """Yield one document per group of rows, each prefixed with the CSV header.
+
+    ``source`` is a path or an in-memory ``(name, bytes)`` upload. With
+    ``rows_per_chunk=None`` the whole file is returned as a single document.
+    """
+    file_path = source_name(source)
+    with open_text(source) as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+
+        id_index = next((header.index(col) for col in ID_COLUMNS if col in header), None)
+        risk_type_index = header.index(RISK_TYPE_COLUMN) if RISK_TYPE_COLUMN in header else None
+
+        rows = []
+        first_row = 1
+        for row_number, row in enumerate(reader, start=1):
+            if not any(cell.strip() for cell in row):
+                continue
+            if not rows:
+                first_row = row_number
+            rows.append(row)
+            if rows_per_chunk and len(rows) >= rows_per_chunk:
+                yield _csv_chunk(file_path, header, rows, first_row, row_number, id_index, risk_type_index)
+                rows = []
+        if rows:
+            yield _csv_chunk(file_path, header, rows, first_row, row_number, id_index, risk_type_index)
+
+
+def _csv_chunk(file_path, header, rows, first_row, last_row, id_index, risk_type_index):
+    from langchain.schema import Document as LCDocument
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(header)
+    writer.writerows(rows)
+
+    metadata = {"source": str(file_path), "rows": f"{first_row}-{last_row}"}
+    if id_index is not None:
+        metadata["data_point_ids"] = ", ".join(row[id_index] for row in rows if len(row) > id_index)
+    if risk_type_index is not None:
+        risk_types = dict.fromkeys(row[risk_type_index] for row in rows if len(row) > risk_type_index)
+        metadata["risk_types"] = ", ".join(risk_types)
+    return LCDocument(page_content=buffer.getvalue(), metadata=metadata)
+
+
+def load_file(source, csv_rows_per_chunk=None, cache_dir=EXTRACTION_CACHE_DIR):
+    from langchain.schema import Document as LCDocument
+
+    file_path = source_name(source)
+    if file_path.endswith(".csv"):
+        # Rows are streamed in groups that keep the header for context
+        return list(iter_csv_documents(source, rows_per_chunk=csv_rows_per_chunk))
+    # PyPDF2/python-docx first, unstructured only when they find no usable text
+    extracted = extract_text(source[1] if isinstance(source, tuple) else source, file_path.rsplit(".", 1)[-1].lower(), cache_dir=cache_dir)
+    return [
+        LCDocument(
+            page_content=page["text"],
+            metadata={"source": file_path, "page_number": page["page_number"], "extractor": extracted["extractor"]},
+        )
+        for page in extracted["pages"]
+        if page["text"].strip()
+    ]
+
+
+def source_size(source):
+    if isinstance(source, tuple):
+        return len(source[1])
+    try:
+        return os.path.getsize(source)
+    except OSError:
+        # Reported per file by the in-process load
+        return 0
+
+
+class ParserPool:
+    """Long-lived ``parse_worker.py`` processes shared by every ``load_files`` call.
+
+    Workers are started on demand, up to ``size``, and reused across calls.
+    They run as plain scripts rather than multiprocessing children, so they
+    never re-import the app's ``__main__`` page. A worker still busy after
+    ``timeout`` is killed and replaced.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._threads = concurrent.futures.ThreadPoolExecutor(max_workers=size, thread_name_prefix="parser")
+        self._idle = queue.SimpleQueue()
+        self._workers = set()
+        self._lock = threading.Lock()
+
+    def submit(self, source, timeout, cache_dir=EXTRACTION_CACHE_DIR):
+        # Workers keep the directory they were started in, so the cache path is made absolute
+        return self._threads.submit(self._parse, source, timeout, os.path.abspath(cache_dir))
+
+    def _checkout(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker.poll() is None:
+                return worker
+            self._discard(worker)
+        worker = subprocess.Popen([sys.executable, PARSE_WORKER_SCRIPT], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    def _discard(self, worker):
+        worker.kill()
+        worker.wait()
+        with self._lock:
+            self._workers.discard(worker)
+
+    def _parse(self, source, timeout, cache_dir):
+        worker = self._checkout()
+        watchdog = threading.Timer(timeout, worker.kill)
+        watchdog.start()
+        try:
+            pickle.dump((source, cache_dir), worker.stdin)
+            worker.stdin.flush()
+            ok, result = pickle.load(worker.stdout)
+        except (EOFError, OSError, pickle.UnpicklingError):
+            timed_out = watchdog.finished.is_set()
+            self._discard(worker)
+            if timed_out:
+                raise concurrent.futures.TimeoutError()
+            raise RuntimeError("parser worker exited unexpectedly")
+        finally:
+            watchdog.cancel()
+        self._idle.put(worker)
+        if not ok:
+            raise RuntimeError(result)
+        return result
+
+    def close(self):
+        with self._lock:
+            workers = list(self._workers)
+        for worker in workers:
+            worker.kill()
+        self._threads.shutdown(wait=False, cancel_futures=True)
+
+
+_parser_pool = None
+_parser_pool_lock = threading.Lock()
+
+
+def parser_pool(size=None):
+    """The process-wide ``ParserPool``, sized by the first caller (default: CPU count)."""
+    global _parser_pool
+    with _parser_pool_lock:
+        if _parser_pool is None:
+            _parser_pool = ParserPool(size or os.cpu_count() or 1)
+            atexit.register(_parser_pool.close)
+        return _parser_pool
+
+
+def load_file_with_timeout(source, timeout, cache_dir=EXTRACTION_CACHE_DIR):
+    # A hung in-process parser cannot be killed, so it is left on a daemon thread
+    outcome = queue.SimpleQueue()
+
+    def run():
+        try:
+            outcome.put((True, load_file(source, cache_dir=cache_dir)))
+        except Exception as e:
+            outcome.put((False, e))
+
+    threading.Thread(target=run, name="parser-inprocess", daemon=True).start()
+    try:
+        ok, result = outcome.get(timeout=timeout)
+    except queue.Empty:
+        raise concurrent.futures.TimeoutError() from None
+    if not ok:
+        raise result
+    return result
+
+
+def load_files(sources, csv_rows_per_chunk=None, max_workers=None, file_timeout=LOADER_FILE_TIMEOUT, cache_dir=EXTRACTION_CACHE_DIR):
+    """Load files in order, parsing large PDF/DOCX files in worker processes.
+
+    Each entry is a path or an in-memory ``(name, bytes)`` upload. CSVs are
+    streamed in-process. PDF/DOCX files up to ``INPROCESS_PARSE_BYTES`` are
+    parsed in-process, where a worker round-trip would cost more than the
+    parse; larger ones go to the shared ``parser_pool`` (``max_workers`` sizes
+    it on first use; ``0`` parses everything in-process). Every PDF/DOCX gets
+    ``file_timeout`` seconds, and extracted pages are cached under
+    ``cache_dir``. Failures are reported per file and never abort
+    the rest of the batch.
+    """
+    futures = {}
+    if max_workers != 0:
+        for i, source in enumerate(sources):
+            if not source_name(source).endswith(".csv") and source_size(source) > INPROCESS_PARSE_BYTES:
+                futures[i] = parser_pool(max_workers).submit(source, file_timeout, cache_dir)
+
+    all_documents = []
+    for i, source in enumerate(sources):
+        try:
+            if i in futures:
+                all_documents.extend(futures[i].result())
+            elif source_name(source).endswith(".csv"):
+                all_documents.extend(load_file(source, csv_rows_per_chunk))
+            else:
+                all_documents.extend(load_file_with_timeout(source, file_timeout, cache_dir))
+        except concurrent.futures.TimeoutError:
+            print(f"⚠️ Could not load {source_name(source)}: timed out after {file_timeout}s")
+        except Exception as e:
+            print(f"⚠️ Could not load {source_name(source)}: {e}")
+    return all_documents
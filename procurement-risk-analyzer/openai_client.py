@@ -0,0 +1,312 @@
+"""Process-wide HTTP layer for every OpenAI call.
+
+The LangChain chat and embedding models are all handed the same pooled httpx
+client, so keep-alive connections are reused across runs and sessions. Its
+transport sits under the OpenAI SDK (whose own retries are turned off) and:
+
+- waits on a per-model token bucket for requests/min and tokens/min, and
+  pauses every caller of a model when the API answers with Retry-After;
+- retries 429s, 5xxs and dropped connections with jittered exponential backoff;
+- coalesces identical embedding requests that are in flight at the same time.
+
+Limits come from OPENAI_REQUESTS_PER_MINUTE, OPENAI_TOKENS_PER_MINUTE,
+OPENAI_MAX_RETRIES and OPENAI_MAX_CONNECTIONS. The OpenAI SDK's
+OPENAI_BASE_URL points the whole layer at a local mock server
+(benchmarks/openai_mock.py).
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+import httpx
+
+DEFAULT_REQUESTS_PER_MINUTE = 500
+DEFAULT_TOKENS_PER_MINUTE = 200_000
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_MAX_CONNECTIONS = 20
+BASE_BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 30.0
+RETRY_STATUSES = (408, 409, 429, 500, 502, 503, 504)
+# Followers of a coalesced request get the decoded body, so transfer headers no longer apply
+HOP_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+_lock = threading.Lock()
+_settings = None
+_limiters = {}
+_http_client = None
+_stats = {"requests": 0, "retries": 0, "rate_limited": 0, "coalesced": 0, "throttled_seconds": 0.0}
+
+
+def configure(requests_per_minute=None, tokens_per_minute=None, max_retries=None, max_connections=None):
+    """Set the process-wide limits; unset values come from the environment. Drops existing clients."""
+    global _settings, _http_client
+    settings = {
+        "requests_per_minute": requests_per_minute or int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", DEFAULT_REQUESTS_PER_MINUTE)),
+        "tokens_per_minute": tokens_per_minute or int(os.getenv("OPENAI_TOKENS_PER_MINUTE", DEFAULT_TOKENS_PER_MINUTE)),
+        "max_retries": max_retries if max_retries is not None else int(os.getenv("OPENAI_MAX_RETRIES", DEFAULT_MAX_RETRIES)),
+        "max_connections": max_connections or int(os.getenv("OPENAI_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS)),
+    }
+    with _lock:
+        _settings = settings
+        _limiters.clear()
+        _http_client = None
+    return settings
+
+
+def get_settings():
+    return _settings or configure()
+
+
+def record(counter, amount=1):
+    with _lock:
+        _stats[counter] += amount
+
+
+def client_stats():
+    with _lock:
+        return dict(_stats, throttled_seconds=round(_stats["throttled_seconds"], 2))
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount, now):
+        """Take ``amount`` now (going into debt if needed); returns seconds until it is covered."""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        # A request larger than the bucket waits for a full bucket instead of forever
+        self.level -= min(amount, self.capacity)
+        return max(0.0, -self.level / self.rate)
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens):
+        """Seconds the caller must wait before sending a request of ``tokens`` tokens."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(self.requests.reserve(1, now), self.tokens.reserve(tokens, now))
+            return max(wait, self.blocked_until - now)
+
+    def pause(self, seconds):
+        # Every caller of the model backs off together instead of storming the API
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+def limiter_for(model):
+    settings = get_settings()
+    with _lock:
+        if model not in _limiters:
+            _limiters[model] = RateLimiter(settings["requests_per_minute"], settings["tokens_per_minute"])
+        return _limiters[model]
+
+
+def count_tokens(value):
+    # Rough chars/4 estimate (as context_packer falls back to); token-id arrays count exactly
+    if isinstance(value, str):
+        return len(value) // 4 + 1
+    if isinstance(value, int):
+        return 1
+    if isinstance(value, list):
+        return sum(count_tokens(item) for item in value)
+    if isinstance(value, dict):
+        return count_tokens(value.get("content") or "")
+    return 0
+
+
+def request_budget(body):
+    """(model, estimated tokens) of an OpenAI request body."""
+    try:
+        payload = json.loads(body or b"{}")
+    except ValueError:
+        return "", 0
+    tokens = count_tokens(payload.get("input", [])) + count_tokens(payload.get("messages", []))
+    tokens += payload.get("max_completion_tokens") or payload.get("max_tokens") or 0
+    return str(payload.get("model", "")), tokens
+
+
+def backoff_delay(attempt):
+    # Exponential backoff with half of each step jittered, so retries from many callers spread out
+    step = min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** attempt)
+    return step / 2 + random.uniform(0, step / 2)
+
+
+def retry_after(response):
+    try:
+        if "retry-after-ms" in response.headers:
+            return float(response.headers["retry-after-ms"]) / 1000
+        if "retry-after" in response.headers:
+            return float(response.headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+class PendingResponse:
+    def __init__(self):
+        self.done = threading.Event()
+        self.status_code = None
+        self.headers = None
+        self.content = None
+        self.error = None
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    def __init__(self, max_retries, max_connections):
+        self.max_retries = max_retries
+        self._transport = httpx.HTTPTransport(limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections))
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def handle_request(self, request):
+        if request.method == "POST" and request.url.path.endswith("/embeddings"):
+            return self._coalesced(request)
+        return self._send(request)
+
+    def _send(self, request):
+        model, tokens = request_budget(request.read())
+        limiter = limiter_for(model)
+        for attempt in range(self.max_retries + 1):
+            wait = limiter.reserve(tokens)
+            if wait > 0:
+                record("throttled_seconds", wait)
+                time.sleep(wait)
+            record("requests")
+            try:
+                response = self._transport.handle_request(request)
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    return response
+                delay = retry_after(response) or backoff_delay(attempt)
+                if response.status_code == 429:
+                    record("rate_limited")
+                    limiter.pause(delay)
+                response.close()
+            record("retries")
+            time.sleep(delay)
+
+    def _coalesced(self, request):
+        # Same endpoint, API key and body: one request goes out, the callers that arrive meanwhile share its answer
+        key = hashlib.sha256(b"\0".join([bytes(request.url.raw_path), request.headers.get("authorization", "").encode(), request.read()])).hexdigest()
+        with self._lock:
+            pending = self._in_flight.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._in_flight[key] = PendingResponse()
+        if not leader:
+            pending.done.wait()
+            record("coalesced")
+            if pending.error is not None:
+                raise pending.error
+            return httpx.Response(pending.status_code, headers=pending.headers, content=pending.content, request=request)
+        try:
+            response = self._send(request)
+            pending.content = response.read()
+            pending.status_code = response.status_code
+            pending.headers = [(name, value) for name, value in response.headers.items() if name.lower() not in HOP_HEADERS]
+            return response
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            pending.done.set()
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, max_retries, max_connections):
+        self.max_retries = max_retries
+        self._transport = httpx.AsyncHTTPTransport(limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections))
+
+    async def handle_async_request(self, request):
+        model, tokens = request_budget(await request.aread())
+        limiter = limiter_for(model)
+        for attempt in range(self.max_retries + 1):
+            wait = limiter.reserve(tokens)
+            if wait > 0:
+                record("throttled_seconds", wait)
+                await asyncio.sleep(wait)
+            record("requests")
+            try:
+                response = await self._transport.handle_async_request(request)
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    return response
+                delay = retry_after(response) or backoff_delay(attempt)
+                if response.status_code == 429:
+                    record("rate_limited")
+                    limiter.pause(delay)
+                await response.aclose()
+            record("retries")
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+def shared_http_client():
+    """The process-wide pooled client for synchronous OpenAI calls."""
+    global _http_client
+    settings = get_settings()
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(transport=RateLimitedTransport(settings["max_retries"], settings["max_connections"]), timeout=httpx.Timeout(600.0, connect=10.0))
+        return _http_client
+
+
+def async_http_client():
+    """A pooled async client sharing the process-wide limits.
+
+    Async connections belong to one event loop, so each ``asyncio.run`` gets its
+    own client and closes it when done.
+    """
+    settings = get_settings()
+    return httpx.AsyncClient(transport=AsyncRateLimitedTransport(settings["max_retries"], settings["max_connections"]), timeout=httpx.Timeout(600.0, connect=10.0))
+
+
+def create_chat_model(model_name, temperature, api_key, streaming=False, http_async_client=None):
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model=model_name,
+        temperature=temperature,
+        openai_api_key=api_key,
+        streaming=streaming,
+        http_client=shared_http_client(),
+        http_async_client=http_async_client,
+        # Retries and backoff happen in the shared transport
+        max_retries=0,
+    )
+
+
+def create_openai_embeddings(api_key, **options):
+    from langchain_openai import OpenAIEmbeddings
+
+    return OpenAIEmbeddings(openai_api_key=api_key, http_client=shared_http_client(), max_retries=0, **options)
@@ -0,0 +1,36 @@
+"""Long-lived PDF/DOCX parser process used by ``loaders.ParserPool``.
+
+Reads pickled ``(source, cache_dir)`` requests from stdin and writes one
+pickled ``(ok, result)`` reply per request to stdout until stdin closes. Run as
+a plain script so the worker never imports the web app's ``__main__`` page.
+"""
+
+import os
+import pickle
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    requests, replies = sys.stdin.buffer, sys.stdout.buffer
+    # stdout carries the replies, so prints from the parsers go to stderr
+    sys.stdout = sys.stderr
+
+    from loaders import load_file
+
+    while True:
+        try:
+            source, cache_dir = pickle.load(requests)
+        except EOFError:
+            return 0
+        try:
+            reply = (True, load_file(source, cache_dir=cache_dir))
+        except Exception as e:
+            reply = (False, f"{type(e).__name__}: {e}")
+        pickle.dump(reply, replies)
+        replies.flush()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
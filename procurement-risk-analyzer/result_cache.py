@@ -0,0 +1,90 @@
+"""Memoized end-to-end analysis results.
+
+A result is keyed by a fingerprint of everything that shapes the LLM answer:
+the query, target and risks content, the retrieved document ids, the model, its
+temperature, the prompt token budget and the analysis mode. Entries expire after
+a TTL and the least recently used ones are evicted once the cache holds more
+than ``max_entries`` results.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Sized for a nightly batch sweep of thousands of targets, so results survive until the next run
+DEFAULT_MAX_ENTRIES = 20_000
+
+
+def analysis_fingerprint(query, target_content, risks_content, retrieved_ids, model, temperature, context_token_budget=None, analysis_mode="single"):
+    payload = json.dumps(
+        {
+            "query": query,
+            "target": hashlib.sha256(target_content.encode("utf-8")).hexdigest(),
+            "risks": hashlib.sha256(risks_content.encode("utf-8")).hexdigest(),
+            "retrieved_ids": list(retrieved_ids),
+            "model": model,
+            "temperature": temperature,
+            "context_token_budget": context_token_budget,
+            "analysis_mode": analysis_mode,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, cache_path="result_cache/results.sqlite", ttl_seconds=7 * 24 * 3600, max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        cache_dir = os.path.dirname(str(cache_path))
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(str(cache_path), check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS results (
+                fingerprint TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_last_used ON results (last_used)")
+        self._conn.commit()
+
+    def get(self, fingerprint):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result, created_at FROM results WHERE fingerprint = ?", (fingerprint,)
+            ).fetchone()
+            if row is None:
+                return None
+            result, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM results WHERE fingerprint = ?", (fingerprint,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE results SET last_used = ? WHERE fingerprint = ?", (now, fingerprint))
+            self._conn.commit()
+            return result
+
+    def put(self, fingerprint, result):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (fingerprint, result, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (fingerprint, result, now, now),
+            )
+            self._conn.execute("DELETE FROM results WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                """DELETE FROM results WHERE fingerprint IN (
+                    SELECT fingerprint FROM results ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries,),
+            )
+            self._conn.commit()
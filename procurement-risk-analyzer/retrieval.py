@@ -0,0 +1,27 @@
+"""Retrieval helpers for the historical FAISS index."""
+
+import numpy as np
+
+# Standard smoothing constant from the reciprocal rank fusion paper
+RRF_K = 60
+
+
+def search_by_vectors(vector_store, vectors, k):
+    """Search all probe vectors in one FAISS call and return a ranked list of docstore ids per probe."""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if getattr(vector_store, "_normalize_L2", False):
+        matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    _, indices = vector_store.index.search(matrix, k)
+    return [
+        [vector_store.index_to_docstore_id[i] for i in row if i != -1]
+        for row in indices
+    ]
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
@@ -0,0 +1,144 @@
+"""Incremental re-analysis of revised CSV targets.
+
+A CSV target is fingerprinted row by row on its "Data Point ID", and the rows
+are stored with each analysis under a revision key (the target's path by
+default; the web apps scope it to the submitter), together with the
+per-category sections of a map-reduce run. Single-prompt runs store no
+sections, so only map-reduce runs are re-analysed incrementally. When a
+revision of the same target comes back under the same register, query and
+settings, only the risk categories touched by added, changed or removed rows
+are analysed again. Their sections are then merged with the stored ones, so
+turnaround follows the size of the change rather than the document.
+"""
+
+import csv
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from loaders import RISK_TYPE_COLUMN
+
+ROW_ID_COLUMN = "Data Point ID"
+# One snapshot per target; sized so a nightly sweep of thousands of targets finds each one again
+DEFAULT_MAX_REVISIONS = 20_000
+
+
+def content_digest(texts):
+    digest = hashlib.sha256()
+    for text in texts:
+        digest.update(hashlib.sha256(text.encode("utf-8")).digest())
+    return digest.hexdigest()
+
+
+def settings_fingerprint(settings):
+    return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def parse_target_rows(target_text):
+    """``{data point id: row}`` for a CSV target, or None when rows cannot be keyed."""
+    try:
+        reader = csv.DictReader(io.StringIO(target_text))
+        if reader.fieldnames is None or ROW_ID_COLUMN not in reader.fieldnames:
+            return None
+        rows = {}
+        for row in reader:
+            row_id = (row.get(ROW_ID_COLUMN) or "").strip()
+            if not row_id or row_id in rows:
+                # Without a unique id rows cannot be matched across revisions
+                return None
+            rows[row_id] = {column: (value or "").strip() for column, value in row.items() if column is not None}
+    except csv.Error:
+        return None
+    return rows
+
+
+def row_fingerprint(row):
+    return hashlib.sha256(json.dumps(row, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def diff_rows(previous_fingerprints, previous_rows, current_rows):
+    """Added, changed and removed rows, in target order, as ``{"id", "change", "before", "after"}``."""
+    changes = []
+    for row_id, row in current_rows.items():
+        if row_id not in previous_fingerprints:
+            changes.append({"id": row_id, "change": "added", "before": None, "after": row})
+        elif previous_fingerprints[row_id] != row_fingerprint(row):
+            changes.append({"id": row_id, "change": "changed", "before": previous_rows.get(row_id), "after": row})
+    for row_id in previous_fingerprints:
+        if row_id not in current_rows:
+            changes.append({"id": row_id, "change": "removed", "before": previous_rows.get(row_id), "after": None})
+    return changes
+
+
+def row_risk_types(historical_documents):
+    """Risk types of each Data Point ID, read from historical CSV rows that carry a "Risk Type"."""
+    risk_types = {}
+    for doc in historical_documents:
+        if "risk_types" not in doc.metadata or "data_point_ids" not in doc.metadata:
+            continue
+        for row in csv.DictReader(io.StringIO(doc.page_content)):
+            row_id = (row.get(ROW_ID_COLUMN) or "").strip()
+            risk_type = (row.get(RISK_TYPE_COLUMN) or "").strip()
+            if row_id and risk_type:
+                risk_types.setdefault(row_id, set()).add(risk_type)
+    return risk_types
+
+
+def affected_categories(changes, categories, risk_types_by_row):
+    """Categories whose analysis the changes invalidate, in register order.
+
+    A row's category comes from its own "Risk Type" column, else from the
+    history. A row whose category is unknown, or not in the register,
+    invalidates every category.
+    """
+    affected = set()
+    for change in changes:
+        row_types = {row[RISK_TYPE_COLUMN] for row in (change["before"], change["after"]) if row and row.get(RISK_TYPE_COLUMN)}
+        row_types = (row_types or risk_types_by_row.get(change["id"], set())) & set(categories)
+        if not row_types:
+            return list(categories)
+        affected |= row_types
+    return [risk_type for risk_type in categories if risk_type in affected]
+
+
+class RevisionStore:
+    def __init__(self, store_path="result_cache/revisions.sqlite", max_entries=DEFAULT_MAX_REVISIONS):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        store_dir = os.path.dirname(str(store_path))
+        if store_dir:
+            os.makedirs(store_dir, exist_ok=True)
+        self._conn = sqlite3.connect(str(store_path), check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS revisions (
+                revision_key TEXT PRIMARY KEY,
+                snapshot TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_revisions_updated_at ON revisions (updated_at)")
+        self._conn.commit()
+
+    def get(self, revision_key):
+        with self._lock:
+            row = self._conn.execute("SELECT snapshot FROM revisions WHERE revision_key = ?", (revision_key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, revision_key, snapshot):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO revisions (revision_key, snapshot, updated_at) VALUES (?, ?, ?)",
+                (revision_key, json.dumps(snapshot), time.time()),
+            )
+            self._conn.execute(
+                """DELETE FROM revisions WHERE revision_key IN (
+                    SELECT revision_key FROM revisions ORDER BY updated_at DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries,),
+            )
+            self._conn.commit()
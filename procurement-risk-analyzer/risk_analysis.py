@@ -0,0 +1,652 @@
+"""RAG pipeline for procurement risk analysis.
+
+Kept free of Streamlit so the same pipeline backs the web apps and the
+headless batch CLI.
+"""
+
+import asyncio
+import contextlib
+import copy
+import glob
+import os
+import re
+import time
+
+from context_packer import DEFAULT_CONTEXT_TOKEN_BUDGET, TokenCounter, pack_context
+from extractors import EXTRACTION_CACHE_DIR
+from loaders import CSV_ROWS_PER_CHUNK, LOADER_FILE_TIMEOUT, load_files
+from history_store import AnalysisHistory
+from result_cache import DEFAULT_MAX_ENTRIES, ResultCache, analysis_fingerprint
+from revisions import DEFAULT_MAX_REVISIONS, RevisionStore, affected_categories, content_digest, diff_rows, parse_target_rows, row_fingerprint, row_risk_types, settings_fingerprint
+from tracing import RunProfile
+
+# langchain, FAISS and NumPy are imported inside the methods that use them so
+# the apps can render their first page before those packages are loaded.
+
+SUPPORTED_EXTS = ["csv", "pdf", "docx"]
+RETRIEVAL_MODES = ("hybrid", "dense", "lexical")
+# "map_reduce" assesses each Risk Type of the register in its own concurrent LLM call
+ANALYSIS_MODES = ("single", "map_reduce")
+LLM_SLOT_POLL_SECONDS = 0.05
+
+CATEGORY_ANALYSIS_TEMPLATE = '''You are a procurement risk assessment AI. Evaluate the target document for one risk category only: {risk_type}.
+    
+    ### Target Document:
+    {target_document_content}
+    
+    ### {risk_type} entries of the Risks Document:
+    {risks_document_content}
+
+    ### Pre-computed Metrics (deterministic; use these figures as given):
+    {precomputed_metrics}
+    
+    ### Retrieved Risk-Related Documents:
+    {retrieved_docs_str}
+    
+    ### Task:
+    Assess only the {risk_type} entries above against the target document.
+    
+    Output the risk label and a short explanation for each entry.
+    
+    Risk Assessment:
+    
+    Based on these entries summarize a mitigation plan.
+    
+    Mitigation Plan:'''
+MITIGATION_HEADING = re.compile(r"[#*\s]*Mitigation Plan\s*:?[*\s]*", re.IGNORECASE)
+ASSESSMENT_HEADING = re.compile(r"^[#*\s]*Risk Assessment\s*:?[*\s]*", re.IGNORECASE)
+
+
+def merge_category_analyses(analyses):
+    """Merge ``{risk type: analysis}`` into one Risk Assessment and one Mitigation Plan."""
+    assessments = []
+    mitigations = []
+    for risk_type, analysis in analyses.items():
+        assessment, *mitigation = MITIGATION_HEADING.split(analysis, maxsplit=1)
+        mitigation = mitigation[0] if mitigation else ""
+        assessments.append(f"#### {risk_type}\n{ASSESSMENT_HEADING.sub('', assessment).strip()}")
+        if mitigation.strip():
+            mitigations.append(f"#### {risk_type}\n{mitigation.strip()}")
+    return "Risk Assessment:\n\n" + "\n\n".join(assessments) + "\n\nMitigation Plan:\n\n" + "\n\n".join(mitigations)
+
+
+class RAGProcurementRisksAnalysis:
+    def __init__(self, api_key, query, historical_documents_folder_path=None, risks_document_folder_path=None, target_document_folder_path=None, risk_analysis_output_path=None, index_folder_path="historical_index", historical_documents=None, risks_document=None, target_document=None, historical_files=None, risks_files=None, target_files=None, embedding_cache_path="embedding_cache/embeddings.sqlite", search_probes=("query", "risks", "target"), search_k=3, loader_workers=None, loader_timeout=LOADER_FILE_TIMEOUT, extraction_cache_dir=EXTRACTION_CACHE_DIR, model_name="gpt-4o", temperature=0.5, result_cache_path="result_cache/results.sqlite", context_token_budget=DEFAULT_CONTEXT_TOKEN_BUDGET, retrieval_mode="hybrid", profile=None, embeddings=None, llm=None, analysis_mode="single", max_concurrent_llm_calls=4, index_type="flat", embeddings_backend="openai", llm_slots=None, revision_store_path="result_cache/revisions.sqlite", revision_key=None, result_cache_max_entries=DEFAULT_MAX_ENTRIES, revision_max_entries=DEFAULT_MAX_REVISIONS, history_store_path="history/analyses.sqlite"):
+        if retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode {retrieval_mode!r}; expected one of {RETRIEVAL_MODES}")
+        if analysis_mode not in ANALYSIS_MODES:
+            raise ValueError(f"Unknown analysis mode {analysis_mode!r}; expected one of {ANALYSIS_MODES}")
+        self.api_key = api_key
+        self.query = query
+        # Timing, token and cost spans for every stage of this run
+        self.profile = profile or RunProfile()
+        self.loader_workers = loader_workers
+        self.loader_timeout = loader_timeout
+        self.extraction_cache_dir = extraction_cache_dir
+        # Already-loaded documents skip loading; in-memory (name, bytes) uploads skip the disk
+        if historical_documents is None:
+            historical_documents = self.load_sources(historical_files, historical_documents_folder_path, csv_rows_per_chunk=CSV_ROWS_PER_CHUNK)
+        if risks_document is None:
+            risks_document = self.load_sources(risks_files, risks_document_folder_path)
+        if target_document is None:
+            # The batch CLI leaves the target empty and supplies one per run via for_target
+            target_document = self.load_sources(target_files, target_document_folder_path)
+        self.historical_documents = historical_documents
+        self.risks_document = risks_document
+        self.target_document = target_document
+        self.risk_analysis_output_path = risk_analysis_output_path
+        self.index_folder_path = index_folder_path
+        self.index_type = index_type
+        self.embedding_cache_path = embedding_cache_path
+        self.embedding_cache_stats = None
+        self.search_probes = search_probes
+        self.search_k = search_k
+        self.retrieval_mode = retrieval_mode
+        # Injected embeddings/LLM (e.g. offline stand-ins in the benchmarks) replace the OpenAI clients
+        self.base_embeddings = embeddings
+        # "openai", or "hashing" for local retrieval without network or API key
+        self.embeddings_backend = embeddings_backend
+        self.llm = llm
+        self.analysis_mode = analysis_mode
+        self.max_concurrent_llm_calls = max_concurrent_llm_calls
+        # Optional threading.Semaphore shared across runs (the web job queue) capping LLM calls server-wide
+        self.llm_slots = llm_slots
+        self.output_file_name = "risk_analysis.txt"
+        self.model_name = model_name
+        self.temperature = temperature
+        self.result_cache_path = result_cache_path
+        self.result_cache_max_entries = result_cache_max_entries
+        self.context_token_budget = context_token_budget
+        self.retrieved_ids = []
+        self.retrieved_documents = []
+        self.context_report = None
+        self.risk_metrics = None
+        self.result_cache_hit = False
+        # Revisions of the same target are matched on this key; defaults to the target's file name
+        self.revision_store_path = revision_store_path
+        self.revision_max_entries = revision_max_entries
+        self.explicit_revision_key = revision_key
+        self.revision_changes = None
+        self.reanalyzed_categories = None
+        # Every finished analysis is kept for portfolio queries and exports; None disables it
+        self.history_store_path = history_store_path
+        self.history_id = None
+        self._vector_store = None
+        self._embeddings = None
+        self._lexical_index = None
+        self._result_cache = None
+        self._revision_store = None
+        self._history_store = None
+
+    def load_documents(self, folder_path, csv_rows_per_chunk=None):
+        with self.profile.span("load", folder=str(folder_path)) as span:
+            file_paths = []
+            for ext in SUPPORTED_EXTS:
+                file_paths.extend(sorted(glob.glob(f"{folder_path}/*.{ext}")))
+            span["files"] = len(file_paths)
+        with self.profile.span("parse", files=len(file_paths)) as span:
+            all_documents = load_files(file_paths, csv_rows_per_chunk=csv_rows_per_chunk, max_workers=self.loader_workers, file_timeout=self.loader_timeout, cache_dir=self.extraction_cache_dir)
+            span["documents"] = len(all_documents)
+        print(f"📄 Loaded {len(all_documents)} docs from {folder_path}")
+        return all_documents
+
+    def load_sources(self, files, folder_path, csv_rows_per_chunk=None):
+        if files is not None:
+            with self.profile.span("parse", files=len(files), source="memory") as span:
+                documents = load_files(list(files), csv_rows_per_chunk=csv_rows_per_chunk, max_workers=self.loader_workers, file_timeout=self.loader_timeout, cache_dir=self.extraction_cache_dir)
+                span["documents"] = len(documents)
+            print(f"📄 Loaded {len(documents)} docs from {len(files)} in-memory file(s)")
+            return documents
+        if folder_path is None:
+            return []
+        return self.load_documents(folder_path, csv_rows_per_chunk=csv_rows_per_chunk)
+
+    @property
+    def risks_content(self):
+        # Every loaded risks page or file, not just whichever happened to load first
+        return "\n\n".join(doc.page_content for doc in self.risks_document)
+
+    @property
+    def target_content(self):
+        return "\n\n".join(doc.page_content for doc in self.target_document)
+
+    def for_target(self, target_documents, output_file_name="risk_analysis.txt", revision_key=None):
+        # Shares the loaded history, risk register and index; only the target differs
+        target_rag = copy.copy(self)
+        target_rag.target_document = target_documents
+        target_rag.explicit_revision_key = revision_key
+        target_rag.output_file_name = output_file_name
+        target_rag.profile = RunProfile()
+        target_rag.embedding_cache_stats = None
+        target_rag.retrieved_ids = []
+        target_rag.retrieved_documents = []
+        target_rag.context_report = None
+        target_rag.risk_metrics = None
+        target_rag.result_cache_hit = False
+        target_rag.revision_changes = None
+        target_rag.reanalyzed_categories = None
+        target_rag.history_id = None
+        return target_rag
+
+    def create_embeddings(self):
+        if self._embeddings is None:
+            from embedding_cache import CachedEmbeddings
+            from embeddings_backends import create_embeddings_backend
+            from vector_index import sync_faiss_index
+
+            base_embeddings = self.base_embeddings or create_embeddings_backend(self.embeddings_backend, self.api_key)
+            # Repeated texts (history, risk registers, targets) are served from the local cache
+            token_counter = TokenCounter(getattr(base_embeddings, "model", ""))
+            self._embeddings = CachedEmbeddings(base_embeddings, cache_path=self.embedding_cache_path, token_counter=token_counter)
+            with self.profile.span("index", backend="faiss", index_type=self.index_type, model=self._embeddings.model_name, documents=len(self.historical_documents)) as span:
+                # Only new or changed historical documents are embedded; the rest is reused from disk
+                self._vector_store = sync_faiss_index(self.historical_documents, self._embeddings, self.index_folder_path, index_type=self.index_type)
+                stats = self._embeddings.stats()
+                span.update(input_tokens=stats["embedded_tokens"], cache_hits=stats["hits"], cache_misses=stats["misses"])
+        return self._vector_store, self._embeddings
+
+    def create_lexical_index(self):
+        if self._lexical_index is None:
+            from bm25_index import sync_bm25_index
+
+            with self.profile.span("index", backend="bm25", documents=len(self.historical_documents)):
+                # Kept next to the FAISS store and keyed by the same document ids
+                self._lexical_index = sync_bm25_index(self.historical_documents, self.index_folder_path)
+        return self._lexical_index
+
+    def get_result_cache(self):
+        if self._result_cache is None:
+            self._result_cache = ResultCache(self.result_cache_path, max_entries=self.result_cache_max_entries)
+        return self._result_cache
+
+    @property
+    def revision_key(self):
+        if self.explicit_revision_key or not self.target_document:
+            return self.explicit_revision_key
+        # The full path the target was loaded from; callers sharing one store across users pass a scoped key
+        return self.target_document[0].metadata.get("source", "")
+
+    def get_revision_store(self):
+        if self._revision_store is None:
+            self._revision_store = RevisionStore(self.revision_store_path, max_entries=self.revision_max_entries)
+        return self._revision_store
+
+    def revision_settings(self, risks_content):
+        # Anything besides the target rows that shapes a category analysis
+        return settings_fingerprint({
+            "query": self.query,
+            "risks": content_digest([risks_content]),
+            "history": content_digest(doc.page_content for doc in self.historical_documents),
+            "model": self.model_name,
+            "temperature": self.temperature,
+            "context_token_budget": self.context_token_budget,
+            "retrieval_mode": self.retrieval_mode,
+            "search_k": self.search_k,
+            "search_probes": list(self.search_probes),
+            "embeddings_backend": self.embeddings_backend,
+        })
+
+    def record_revision(self, target_rows, settings, analyses, risk_analysis):
+        if target_rows is None or not self.revision_key:
+            return
+        self.get_revision_store().put(self.revision_key, {
+            "settings": settings,
+            "fingerprints": {row_id: row_fingerprint(row) for row_id, row in target_rows.items()},
+            "rows": target_rows,
+            # Per-category sections of a map-reduce run; None for a single-prompt analysis
+            "analyses": analyses,
+            "result": risk_analysis,
+        })
+
+    def retrieve(self, probe_groups):
+        """Fused ``(ids, documents)`` for each group of probe texts.
+
+        Every probe of every group goes through one embedding call and one
+        index search; the rankings are then fused per group.
+        """
+        from retrieval import reciprocal_rank_fusion, search_by_vectors
+
+        probes = [text for group in probe_groups for text in group]
+        probe_rankings = [[] for _ in probes]
+
+        if self.retrieval_mode in ("dense", "hybrid"):
+            vector_store, embeddings = self.create_embeddings()
+            before = embeddings.stats()
+            with self.profile.span("embed", model=embeddings.model_name, probes=len(probes)) as span:
+                # One batched embedding call and one matrix search for every probe
+                probe_embeddings = embeddings.embed_documents(probes)
+                self.embedding_cache_stats = embeddings.stats()
+                span.update(
+                    input_tokens=self.embedding_cache_stats["embedded_tokens"] - before["embedded_tokens"],
+                    cache_hits=self.embedding_cache_stats["hits"] - before["hits"],
+                    cache_misses=self.embedding_cache_stats["misses"] - before["misses"],
+                )
+            print(f"🧮 Embedding cache: {self.embedding_cache_stats['hits']} hits, {self.embedding_cache_stats['misses']} misses")
+
+        if self.retrieval_mode in ("lexical", "hybrid"):
+            lexical_index = self.create_lexical_index()
+
+        results = []
+        with self.profile.span("search", mode=self.retrieval_mode, k=self.search_k, probes=len(probes)) as span:
+            if self.retrieval_mode in ("dense", "hybrid"):
+                for rankings, ranking in zip(probe_rankings, search_by_vectors(vector_store, probe_embeddings, k=self.search_k)):
+                    rankings.append(ranking)
+                lookup_document = vector_store.docstore.search
+            if self.retrieval_mode in ("lexical", "hybrid"):
+                # Exact identifiers (risk IDs, contract numbers) that embeddings tend to blur
+                for rankings, text in zip(probe_rankings, probes):
+                    rankings.append(lexical_index.search(text, k=self.search_k))
+                lookup_document = lexical_index.get_document
+
+            offset = 0
+            for group in probe_groups:
+                # Fuse the group's rankings; both indexes share content-hash document ids
+                ids = reciprocal_rank_fusion([ranking for rankings in probe_rankings[offset:offset + len(group)] for ranking in rankings])
+                results.append((ids, [lookup_document(doc_id) for doc_id in ids]))
+                offset += len(group)
+            span["retrieved"] = sum(len(ids) for ids, _ in results)
+        return results
+
+    def semantic_search(self):
+        self.retrieved_ids = []
+        self.retrieved_documents = []
+        if not self.historical_documents:
+            print("⚠️ No historical documents to search!")
+            return ""
+
+        probe_texts = {
+            "query": self.query,
+            "risks": self.risks_content,
+            "target": self.target_content,
+        }
+        self.retrieved_ids, self.retrieved_documents = self.retrieve([[probe_texts[probe] for probe in self.search_probes]])[0]
+
+        if not self.retrieved_documents:
+            print("⚠️ No documents retrieved during semantic search!")
+    
+        print(f"🔍 Retrieved {len(self.retrieved_documents)} relevant docs for semantic search.")
+    
+        return "\n\n".join([f"Document {i + 1}: {doc.page_content}" for i, doc in enumerate(self.retrieved_documents)])
+
+    def retrieve_categories(self, categories):
+        if not self.historical_documents:
+            return {risk_type: ([], []) for risk_type in categories}
+        probe_groups = []
+        for risk_type, category_risks in categories.items():
+            probe_texts = {
+                "query": f"{risk_type}: {self.query}",
+                "risks": category_risks,
+                "target": self.target_content,
+            }
+            probe_groups.append([probe_texts[probe] for probe in self.search_probes])
+        retrievals = dict(zip(categories, self.retrieve(probe_groups)))
+        print(f"🔍 Retrieved context for {len(retrievals)} risk categories.")
+        return retrievals
+
+    async def analyze_categories(self, categories, retrievals, target_content, precomputed_metrics, counter):
+        from langchain.prompts import PromptTemplate
+        from openai_client import async_http_client, create_chat_model
+
+        # Async connections are tied to this event loop, so the pool lives for this call only
+        http_async_client = None if self.llm else async_http_client()
+        llm = self.llm or create_chat_model(self.model_name, self.temperature, self.api_key, http_async_client=http_async_client)
+        prompt_template = PromptTemplate(
+            input_variables=["risk_type", "retrieved_docs_str", "risks_document_content", "target_document_content", "precomputed_metrics"],
+            template=CATEGORY_ANALYSIS_TEMPLATE,
+        )
+        semaphore = asyncio.Semaphore(self.max_concurrent_llm_calls)
+        reports = {}
+
+        async def analyze(risk_type, category_risks, retrieved_documents):
+            retrieved_texts = [doc.page_content for doc in retrieved_documents]
+            category_target = target_content
+            if self.context_token_budget:
+                # Each category call gets the full budget for its own, smaller context
+                packed = pack_context(category_target, category_risks, retrieved_texts, budget=self.context_token_budget, counter=counter)
+                reports[risk_type] = packed["report"]
+                category_target, category_risks, retrieved_texts = packed["target"], packed["risks"], packed["retrieved"]
+            retrieved_docs_str = "\n\n".join(f"Document {i + 1}: {text}" for i, text in enumerate(retrieved_texts))
+            if not retrieved_docs_str.strip():
+                retrieved_docs_str = "No relevant documents were retrieved. Please proceed with only risks and target documents."
+            prompt_text = prompt_template.format(
+                risk_type=risk_type,
+                retrieved_docs_str=retrieved_docs_str,
+                risks_document_content=category_risks,
+                target_document_content=category_target,
+                precomputed_metrics=precomputed_metrics,
+            )
+            async with semaphore:
+                if self.llm_slots is not None:
+                    # Polled, not awaited on a thread: a waiter cancelled by a failing sibling must not later take a server-wide slot it never releases
+                    while not self.llm_slots.acquire(blocking=False):
+                        await asyncio.sleep(LLM_SLOT_POLL_SECONDS)
+                try:
+                    with self.profile.span("llm", model=self.model_name, risk_type=risk_type, input_tokens=counter.count(prompt_text)) as span:
+                        response = await llm.ainvoke(prompt_text)
+                        span["output_tokens"] = counter.count(response.content)
+                finally:
+                    if self.llm_slots is not None:
+                        self.llm_slots.release()
+            return response.content
+
+        try:
+            # The first failure (or cancellation) cancels the other categories' calls
+            async with asyncio.TaskGroup() as task_group:
+                tasks = [
+                    task_group.create_task(analyze(risk_type, category_risks, retrievals[risk_type][1]))
+                    for risk_type, category_risks in categories.items()
+                ]
+            analyses = [task.result() for task in tasks]
+        except ExceptionGroup as group:
+            # Callers (and JobCancelled handling) expect the original exception, as from a single call
+            raise group.exceptions[0] from None
+        finally:
+            if http_async_client is not None:
+                await http_async_client.aclose()
+        if reports:
+            self.context_report = {
+                "budget": self.context_token_budget * len(reports),
+                "used_tokens": sum(report["used_tokens"] for report in reports.values()),
+                "dropped": [f"{risk_type}: {dropped}" for risk_type, report in reports.items() for dropped in report["dropped"]],
+                "sections": reports,
+            }
+        return dict(zip(categories, analyses))
+
+    def get_history_store(self):
+        if self._history_store is None:
+            self._history_store = AnalysisHistory(self.history_store_path)
+        return self._history_store
+
+    def record_history(self, risk_analysis, reuse=False):
+        if self.history_store_path is None:
+            return
+        from risk_scoring import category_register_scores
+
+        if reuse:
+            # A result-cache hit is the same analysis again, not a new one for the portfolio
+            self.history_id = self.get_history_store().find(self.revision_key or "target", risk_analysis)
+            if self.history_id is not None:
+                return
+        self.history_id = self.get_history_store().record(
+            self.revision_key or "target",
+            risk_analysis,
+            category_scores=category_register_scores(self.risks_content),
+            metrics=self.risk_metrics,
+            run_id=self.profile.run_id,
+            query=self.query,
+            model=self.model_name,
+            analysis_mode=self.analysis_mode,
+        )
+
+    def save_risk_analysis_to_file(self, risk_analysis):
+        if self.risk_analysis_output_path is None:
+            # In-memory runs (the web apps) hand the result back without touching disk
+            return
+        file_path = f"{self.risk_analysis_output_path}/{self.output_file_name}"
+        os.makedirs(self.risk_analysis_output_path, exist_ok=True)
+        with open(file_path, "w") as file:
+            file.write(risk_analysis)
+    
+    def generate_risks_analysis_rag(self, on_token=None, force_refresh=False):
+        from langchain.chains import LLMChain
+        from langchain.prompts import PromptTemplate
+        from openai_client import create_chat_model
+
+        self.result_cache_hit = False
+        risks_content = self.risks_content
+        target_content = self.target_content
+
+        if not risks_content.strip():
+            print("❌ The risks document is empty. Please upload a valid file.")
+            return "Error: Risks document is empty."
+    
+        if not target_content.strip():
+            print("❌ The target document is empty. Please upload a valid file.")
+            return "Error: Target document is empty."
+
+        from risk_scoring import compute_risk_metrics, format_risk_metrics, group_risk_register
+
+        with self.profile.span("score"):
+            # Schedule/cost variance and register scores are computed here rather than by the LLM
+            self.risk_metrics = compute_risk_metrics(target_content, risks_content)
+        precomputed_metrics = format_risk_metrics(self.risk_metrics)
+
+        categories = None
+        if self.analysis_mode == "map_reduce":
+            categories = group_risk_register(risks_content)
+            if not categories:
+                print("⚠️ The risks document has no Risk Type column; running a single analysis instead.")
+
+        self.revision_changes = None
+        self.reanalyzed_categories = None
+        target_rows = parse_target_rows(target_content) if self.revision_key else None
+        revision_settings = None
+        previous_revision = None
+        if target_rows is not None:
+            revision_settings = self.revision_settings(risks_content)
+            with self.profile.span("revision_diff", revision_key=self.revision_key) as span:
+                previous_revision = self.get_revision_store().get(self.revision_key)
+                if previous_revision is not None:
+                    self.revision_changes = diff_rows(previous_revision["fingerprints"], previous_revision["rows"], target_rows)
+                    span["changed_rows"] = len(self.revision_changes)
+            if self.revision_changes is not None:
+                print(f"🔁 {len(self.revision_changes)} row(s) changed since the last analysis of {self.revision_key}")
+
+        counter = TokenCounter(self.model_name)
+        if (
+            categories
+            and not force_refresh
+            and previous_revision is not None
+            and previous_revision["settings"] == revision_settings
+            and set(categories) <= set(previous_revision["analyses"] or ())
+        ):
+            affected = affected_categories(self.revision_changes, categories, row_risk_types(self.historical_documents))
+            if len(affected) < len(categories):
+                # Categories untouched by the changed rows keep their stored sections
+                analyses = {risk_type: previous_revision["analyses"][risk_type] for risk_type in categories}
+                if affected:
+                    affected_risks = {risk_type: categories[risk_type] for risk_type in affected}
+                    affected_retrievals = self.retrieve_categories(affected_risks)
+                    analyses.update(asyncio.run(self.analyze_categories(affected_risks, affected_retrievals, target_content, precomputed_metrics, counter)))
+                self.reanalyzed_categories = affected
+                print(f"♻️ Re-analyzed {len(affected)} of {len(categories)} risk categories.")
+                risk_analysis = merge_category_analyses(analyses)
+                if on_token is not None:
+                    on_token(risk_analysis)
+                self.record_revision(target_rows, revision_settings, analyses, risk_analysis)
+                self.record_history(risk_analysis)
+                self.save_risk_analysis_to_file(risk_analysis)
+                return risk_analysis
+
+        if categories:
+            category_retrievals = self.retrieve_categories(categories)
+            documents_by_id = {doc_id: doc for ids, docs in category_retrievals.values() for doc_id, doc in zip(ids, docs)}
+            self.retrieved_ids = list(documents_by_id)
+            self.retrieved_documents = list(documents_by_id.values())
+        else:
+            self.semantic_search()
+
+        # Identical inputs, retrieval and model settings give back the stored answer
+        fingerprint = analysis_fingerprint(self.query, target_content, risks_content, self.retrieved_ids, self.model_name, self.temperature, self.context_token_budget, self.analysis_mode if categories else "single")
+        if not force_refresh:
+            with self.profile.span("result_cache") as span:
+                cached_analysis = self.get_result_cache().get(fingerprint)
+                span["hit"] = cached_analysis is not None
+            if cached_analysis is not None:
+                print("⚡ Result cache hit, skipping the LLM call.")
+                self.result_cache_hit = True
+                if on_token is not None:
+                    on_token(cached_analysis)
+                self.record_history(cached_analysis, reuse=True)
+                self.save_risk_analysis_to_file(cached_analysis)
+                return cached_analysis
+
+        if categories:
+            # Per-category calls run concurrently, so wall time follows the slowest category
+            analyses = asyncio.run(self.analyze_categories(categories, category_retrievals, target_content, precomputed_metrics, counter))
+            print(f"🧩 Merged {len(analyses)} per-category analyses.")
+            risk_analysis = merge_category_analyses(analyses)
+            if on_token is not None:
+                on_token(risk_analysis)
+            self.get_result_cache().put(fingerprint, risk_analysis)
+            self.record_revision(target_rows, revision_settings, analyses, risk_analysis)
+            self.record_history(risk_analysis)
+            self.save_risk_analysis_to_file(risk_analysis)
+            return risk_analysis
+
+        retrieved_texts = [doc.page_content for doc in self.retrieved_documents]
+        if self.context_token_budget:
+            with self.profile.span("pack", budget=self.context_token_budget) as span:
+                # Keep the prompt bounded: budget split across sections, best-ranked documents first
+                packed = pack_context(target_content, risks_content, retrieved_texts, budget=self.context_token_budget, counter=counter)
+                span["used_tokens"] = packed["report"]["used_tokens"]
+            self.context_report = packed["report"]
+            target_content, risks_content, retrieved_texts = packed["target"], packed["risks"], packed["retrieved"]
+            print(f"✂️ Packed context: {self.context_report['used_tokens']}/{self.context_token_budget} tokens")
+            for dropped in self.context_report["dropped"]:
+                print(f"   dropped {dropped}")
+        retrieved_docs_str = "\n\n".join(f"Document {i + 1}: {text}" for i, text in enumerate(retrieved_texts))
+
+        # Add fallback for empty inputs
+        if not retrieved_docs_str.strip():
+            retrieved_docs_str = "No relevant documents were retrieved. Please proceed with only risks and target documents."
+
+        # Debug logs
+        print("----- Prompt Preview -----")
+        print("Query:", self.query)
+        print("--- Retrieved Docs ---")
+        print(retrieved_docs_str[:500])
+        print("--- Risks Document ---")
+        print(risks_content[:500])
+        print("--- Target Document ---")
+        print(target_content[:500])
+        print("--- Pre-computed Metrics ---")
+        print(precomputed_metrics)
+
+    
+        prompt_template = PromptTemplate(
+            input_variables=["retrieved_docs_str", "risks_document_content", "target_document_content", "precomputed_metrics"],
+            template='''You are a procurement risk assessment AI. Evaluate the risks associated with the target document
+    based on the retrieved knowledge and the risks detailed in the risks document.
+    
+    ### Target Document:
+    {target_document_content}
+    
+    ### Risks Document:
+    {risks_document_content}
+
+    ### Pre-computed Metrics (deterministic; use these figures as given):
+    {precomputed_metrics}
+    
+    ### Retrieved Risk-Related Documents:
+    {retrieved_docs_str}
+    
+    ### Task:
+    Analyze the target document and classify risks into the categories detailed in the risks document.
+    
+    Output the risk labels and a short explanation for each.
+    
+    Risk Assessment:
+    
+    Based on the risks document summarize a mitigation plan.
+    
+    Mitigation Plan:'''
+        )
+    
+        prompt_inputs = {
+            "retrieved_docs_str": retrieved_docs_str,
+            "risks_document_content": risks_content,
+            "target_document_content": target_content,
+            "precomputed_metrics": precomputed_metrics
+        }
+
+        with self.profile.span("prompt") as span:
+            prompt_text = prompt_template.format(**prompt_inputs)
+            prompt_tokens = counter.count(prompt_text)
+            span["prompt_tokens"] = prompt_tokens
+
+        # Shares the process-wide connection pool, rate limits and retries with every other run
+        llm = self.llm or create_chat_model(self.model_name, self.temperature, self.api_key, streaming=on_token is not None)
+        with self.llm_slots or contextlib.nullcontext(), self.profile.span("llm", model=self.model_name, streaming=on_token is not None, input_tokens=prompt_tokens) as span:
+            if on_token is None:
+                chain = LLMChain(llm=llm, prompt=prompt_template)
+                risk_analysis = chain.run(prompt_inputs)
+            else:
+                # Hand each token to the caller as soon as it arrives
+                started = time.perf_counter()
+                chunks = []
+                for chunk in llm.stream(prompt_text):
+                    if not chunks and chunk.content:
+                        span["first_token_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                        print(f"⏱️ Time to first token: {time.perf_counter() - started:.2f}s")
+                    if chunk.content:
+                        chunks.append(chunk.content)
+                        on_token(chunk.content)
+                risk_analysis = "".join(chunks)
+            span["output_tokens"] = counter.count(risk_analysis)
+
+        self.get_result_cache().put(fingerprint, risk_analysis)
+        self.record_revision(target_rows, revision_settings, None, risk_analysis)
+        self.record_history(risk_analysis)
+        self.save_risk_analysis_to_file(risk_analysis)
+        return risk_analysis
@@ -0,0 +1,204 @@
+"""Deterministic risk pre-scoring for CSV targets.
+
+Schedule variance, cost variance and Likelihood x Impact scores are computed
+with pandas from the data itself, vectorized across rows and across any number
+of targets. The numbers fill the summary panel and are handed to the LLM as
+given facts, so it does not have to do the arithmetic.
+"""
+
+import io
+
+import numpy as np
+import pandas as pd
+
+VALUE_COLUMNS = ("Value", "Variable Value")
+MILESTONE_PATTERN = r"^(Planned|Actual) Milestone Date\s*(?:\((.*)\))?"
+BUDGET_VARIABLE = "Initial Budget Estimate"
+ACTUAL_COST_VARIABLE = "Actual Expenditures"
+MAX_RISK_SCORE = 25  # Likelihood (1-5) x Impact (1-5)
+HIGH_RISK_SCORE = 15
+MEDIUM_RISK_SCORE = 8
+RISK_LEVELS = ("High", "Medium", "Low")
+# Register category -> target metric whose positive value is adverse evidence for it
+EVIDENCE_METRICS = {
+    "Schedule Risk": "schedule_variance_days",
+    "Cost Risk": "cost_variance",
+}
+# Categories without adverse evidence in the target still count, at this weight
+NO_EVIDENCE_WEIGHT = 0.5
+
+
+def read_csv_text(text):
+    return pd.read_csv(io.StringIO(text))
+
+
+def combine_targets(targets):
+    """Stack ``{target id: DataFrame}`` into one long (target, variable, value) frame."""
+    frames = []
+    for target_id, frame in targets.items():
+        value_column = next((col for col in VALUE_COLUMNS if col in frame.columns), None)
+        if value_column is None or "Variable Name" not in frame.columns:
+            continue
+        frames.append(pd.DataFrame({
+            "target": target_id,
+            "variable": frame["Variable Name"].astype(str).str.strip(),
+            "value": frame[value_column].astype(str).str.strip(),
+        }))
+    if not frames:
+        return pd.DataFrame(columns=["target", "variable", "value"])
+    return pd.concat(frames, ignore_index=True)
+
+
+def schedule_variance(long_frame):
+    """Days the worst milestone slipped (actual minus planned) per target."""
+    parts = long_frame["variable"].str.extract(MILESTONE_PATTERN)
+    milestones = long_frame.assign(kind=parts[0], phase=parts[1].fillna("")).dropna(subset=["kind"])
+    milestones = milestones.assign(date=pd.to_datetime(milestones["value"], errors="coerce"))
+    dates = milestones.groupby(["target", "phase", "kind"])["date"].first().unstack("kind")
+    if "Planned" not in dates or "Actual" not in dates:
+        return pd.Series(dtype=float, name="schedule_variance_days")
+    delay = (dates["Actual"] - dates["Planned"]).dt.days
+    return delay.groupby(level="target").max().rename("schedule_variance_days")
+
+
+def cost_variance(long_frame):
+    amounts = pd.to_numeric(long_frame["value"].str.replace(r"[$,\s]", "", regex=True), errors="coerce")
+    costs = long_frame.assign(amount=amounts)
+    costs = costs[costs["variable"].isin([BUDGET_VARIABLE, ACTUAL_COST_VARIABLE])]
+    table = costs.groupby(["target", "variable"])["amount"].first().unstack("variable")
+    if BUDGET_VARIABLE not in table or ACTUAL_COST_VARIABLE not in table:
+        return pd.DataFrame(columns=["cost_variance", "cost_variance_pct"], dtype=float)
+    variance = table[ACTUAL_COST_VARIABLE] - table[BUDGET_VARIABLE]
+    return pd.DataFrame({
+        "cost_variance": variance,
+        "cost_variance_pct": variance / table[BUDGET_VARIABLE].replace(0, np.nan) * 100,
+    })
+
+
+def score_risk_register(risks_frame):
+    """Add Likelihood x Impact ``score`` and High/Medium/Low ``level`` columns."""
+    likelihood_column = next(col for col in risks_frame.columns if col.startswith("Likelihood"))
+    impact_column = next(col for col in risks_frame.columns if col.startswith("Impact"))
+    scores = pd.to_numeric(risks_frame[likelihood_column], errors="coerce") * pd.to_numeric(risks_frame[impact_column], errors="coerce")
+    levels = np.select([scores >= HIGH_RISK_SCORE, scores >= MEDIUM_RISK_SCORE], ["High", "Medium"], default="Low")
+    return risks_frame.assign(score=scores, level=levels)
+
+
+def summarize_targets(targets, risks_frame):
+    """One row of deterministic metrics per target id in ``targets``.
+
+    ``high_risks``/``medium_risks``/``low_risks`` count the register risks of
+    categories with adverse evidence in that target (see ``EVIDENCE_METRICS``);
+    ``register_*_risks`` are the whole register's distribution, the same for
+    every target.
+    """
+    long_frame = combine_targets(targets)
+    summary = pd.DataFrame(index=pd.Index(list(targets), name="target"))
+    summary = summary.join(schedule_variance(long_frame)).join(cost_variance(long_frame))
+
+    register = score_risk_register(risks_frame)
+    category_scores = register.groupby("Risk Type")["score"].max()
+    evidence = pd.DataFrame(False, index=summary.index, columns=category_scores.index)
+    for risk_type, metric in EVIDENCE_METRICS.items():
+        if risk_type in evidence and metric in summary:
+            evidence[risk_type] = summary[metric].gt(0)
+
+    level_counts = register.groupby(["Risk Type", "level"]).size().unstack(fill_value=0).reindex(index=category_scores.index, columns=list(RISK_LEVELS), fill_value=0)
+    evidenced_counts = evidence.astype(int) @ level_counts
+    register_counts = level_counts.sum()
+    for level in RISK_LEVELS:
+        summary[f"{level.lower()}_risks"] = evidenced_counts[level].astype(int)
+    for level in RISK_LEVELS:
+        summary[f"register_{level.lower()}_risks"] = int(register_counts[level])
+
+    # Each category contributes its worst register score, in full where the target shows adverse evidence
+    weights = evidence.astype(float).replace(0.0, NO_EVIDENCE_WEIGHT)
+    summary["risk_score"] = (weights * category_scores).sum(axis=1) / (MAX_RISK_SCORE * max(len(category_scores), 1)) * 100
+    return summary
+
+
+def group_risk_register(risks_text):
+    """Split a CSV risk register into ``{risk type: CSV text}``, in register order.
+
+    Returns None when the register is not a CSV with a "Risk Type" column.
+    """
+    try:
+        register = read_csv_text(risks_text)
+    except Exception:
+        return None
+    if "Risk Type" not in register.columns:
+        return None
+    return {
+        str(risk_type): group.to_csv(index=False)
+        for risk_type, group in register.groupby("Risk Type", sort=False)
+    }
+
+
+def category_register_scores(risks_text):
+    """Worst Likelihood x Impact score per risk type, in register order.
+
+    Returns None when the register is not a scorable CSV with a "Risk Type" column.
+    """
+    try:
+        register = score_risk_register(read_csv_text(risks_text))
+    except Exception:
+        return None
+    if "Risk Type" not in register.columns:
+        return None
+    scores = register.groupby("Risk Type", sort=False)["score"].max()
+    return {str(risk_type): None if pd.isna(score) else int(score) for risk_type, score in scores.items()}
+
+
+def risk_score_label(score):
+    if score >= 70:
+        return "High"
+    if score >= 40:
+        return "Moderate"
+    return "Low"
+
+
+def compute_risk_metrics(target_text, risks_text):
+    """Metrics for a single CSV target, or None when the inputs are not structured CSVs."""
+    try:
+        summary = summarize_targets({"target": read_csv_text(target_text)}, read_csv_text(risks_text))
+        register = score_risk_register(read_csv_text(risks_text))
+    except Exception as e:
+        print(f"⚠️ Could not compute deterministic risk metrics: {e}")
+        return None
+
+    row = summary.iloc[0]
+    top_risks = register.sort_values("score", ascending=False).head(5)
+    id_column = "Risk ID" if "Risk ID" in register.columns else register.columns[0]
+    return {
+        "schedule_variance_days": None if pd.isna(row["schedule_variance_days"]) else int(row["schedule_variance_days"]),
+        "cost_variance": None if pd.isna(row["cost_variance"]) else float(row["cost_variance"]),
+        "cost_variance_pct": None if pd.isna(row["cost_variance_pct"]) else float(row["cost_variance_pct"]),
+        "high_risks": int(row["high_risks"]),
+        "medium_risks": int(row["medium_risks"]),
+        "low_risks": int(row["low_risks"]),
+        "register_high_risks": int(row["register_high_risks"]),
+        "register_medium_risks": int(row["register_medium_risks"]),
+        "register_low_risks": int(row["register_low_risks"]),
+        "risk_score": int(round(row["risk_score"])),
+        "risk_score_label": risk_score_label(row["risk_score"]),
+        "top_risks": [
+            {"id": str(r[id_column]), "type": str(r.get("Risk Type", "")), "score": None if pd.isna(r["score"]) else int(r["score"]), "level": r["level"]}
+            for _, r in top_risks.iterrows()
+        ],
+    }
+
+
+def format_risk_metrics(metrics):
+    if metrics is None:
+        return "No structured metrics could be computed from the target document."
+    lines = []
+    if metrics["schedule_variance_days"] is not None:
+        lines.append(f"- Schedule variance: {metrics['schedule_variance_days']:+d} days (worst milestone, actual vs planned)")
+    if metrics["cost_variance"] is not None:
+        pct = f" ({metrics['cost_variance_pct']:+.1f}% vs initial budget)" if metrics["cost_variance_pct"] is not None else ""
+        lines.append(f"- Cost variance: ${metrics['cost_variance']:,.0f}{pct}")
+    lines.append(f"- Risk register (Likelihood x Impact): {metrics['register_high_risks']} High, {metrics['register_medium_risks']} Medium, {metrics['register_low_risks']} Low")
+    lines.append(f"- Register risks in categories with adverse evidence in the target: {metrics['high_risks']} High, {metrics['medium_risks']} Medium, {metrics['low_risks']} Low")
+    lines.append("- Highest register scores: " + ", ".join(f"{r['id']} {r['type']} ({r['score']}/25)" for r in metrics["top_risks"]))
+    lines.append(f"- Deterministic risk score: {metrics['risk_score']}/100 ({metrics['risk_score_label']})")
+    return "\n".join(lines)
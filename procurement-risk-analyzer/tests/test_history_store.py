@@ -0,0 +1,99 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from history_store import parse_analysis  # noqa: E402
+
+RISK_TYPES = ["Schedule Risk", "Cost Risk", "Supply Chain Risk"]
+
+
+def test_single_prompt_list():
+    risks, mitigations = parse_analysis(
+        "Risk Assessment:\n"
+        "1. Schedule Risk - High: the supplier missed two milestones.\n"
+        "2. Cost Risk - Low: prices are fixed.\n"
+        "\n"
+        "Mitigation Plan:\n"
+        "- Add schedule penalties.\n"
+        "- Review the budget quarterly.\n",
+        RISK_TYPES,
+    )
+    assert [(r["risk_type"], r["severity"], r["explanation"]) for r in risks] == [
+        ("Schedule Risk", "High", "the supplier missed two milestones."),
+        ("Cost Risk", "Low", "prices are fixed."),
+    ]
+    assert [m["item"] for m in mitigations] == ["Add schedule penalties.", "Review the budget quarterly."]
+
+
+def test_nested_label_and_explanation():
+    risks, _ = parse_analysis(
+        "Risk Assessment:\n"
+        "\n"
+        "1. **Schedule Risk**\n"
+        "   - **Label:** High\n"
+        "   - **Explanation:** The supplier missed two milestones.\n"
+        "\n"
+        "2. **Cost Risk**\n"
+        "   - **Label:** Medium\n"
+        "   - **Explanation:** Prices are indexed to steel.\n"
+        "     Steel is volatile this year.\n"
+        "\n"
+        "Mitigation Plan:\n"
+        "- Add schedule penalties.\n",
+        RISK_TYPES,
+    )
+    assert [(r["risk_type"], r["label"], r["severity"], r["explanation"]) for r in risks] == [
+        ("Schedule Risk", "Schedule Risk", "High", "The supplier missed two milestones."),
+        ("Cost Risk", "Cost Risk", "Medium", "Prices are indexed to steel. Steel is volatile this year."),
+    ]
+
+
+def test_nested_fields_without_indent():
+    risks, _ = parse_analysis(
+        "Risk Assessment:\n"
+        "- **Supply Chain Risk:**\n"
+        "- **Severity:** Low\n"
+        "- **Explanation:** Two qualified vendors exist.\n",
+        RISK_TYPES,
+    )
+    assert [(r["risk_type"], r["severity"], r["explanation"]) for r in risks] == [
+        ("Supply Chain Risk", "Low", "Two qualified vendors exist."),
+    ]
+
+
+def test_category_headings():
+    risks, mitigations = parse_analysis(
+        "Risk Assessment:\n"
+        "\n"
+        "#### Schedule Risk\n"
+        "- Late delivery - High: milestones slipped.\n"
+        "- Staffing - Medium: key engineer leaving.\n"
+        "\n"
+        "#### Cost Risk\n"
+        "Exposure is low because prices are fixed.\n"
+        "\n"
+        "Mitigation Plan:\n"
+        "\n"
+        "#### Schedule Risk\n"
+        "- Add penalties.\n",
+        RISK_TYPES,
+    )
+    assert [(r["risk_type"], r["label"], r["severity"]) for r in risks] == [
+        ("Schedule Risk", "Late delivery - High", "High"),
+        ("Schedule Risk", "Staffing - Medium", "Medium"),
+        ("Cost Risk", "Exposure is low because prices are fixed.", "Low"),
+    ]
+    assert mitigations == [{"risk_type": "Schedule Risk", "item": "Add penalties."}]
+
+
+def test_closing_prose_is_not_a_risk():
+    risks, _ = parse_analysis(
+        "Risk Assessment:\n"
+        "Based on the documents, the following risks apply.\n"
+        "1. Schedule Risk - High: milestones slipped.\n"
+        "\n"
+        "Overall the contract carries a medium level of risk.\n",
+        RISK_TYPES,
+    )
+    assert [(r["risk_type"], r["severity"]) for r in risks] == [("Schedule Risk", "High")]
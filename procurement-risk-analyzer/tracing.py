@@ -0,0 +1,102 @@
+"""Per-stage timing spans for an analysis run.
+
+Each stage (load, parse, embed, index, search, prompt, llm, ...) is wrapped in
+a span that records its start offset and wall time plus whatever the stage
+knows about itself:
+token counts, estimated cost, cache hits. Every finished span is printed as a
+single JSON line, and the collected spans back the "Run profile" panel.
+Concurrent spans (per-category LLM calls) overlap, so the run's total is the
+wall time they cover, not the sum of their durations.
+"""
+
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# USD per million tokens; unknown models are timed but not priced
+MODEL_PRICES = {
+    "gpt-4o": {"input": 2.50, "output": 10.00},
+    "gpt-4o-mini": {"input": 0.15, "output": 0.60},
+    "gpt-4-turbo": {"input": 10.00, "output": 30.00},
+    "text-embedding-ada-002": {"input": 0.10, "output": 0.0},
+    "text-embedding-3-small": {"input": 0.02, "output": 0.0},
+    "text-embedding-3-large": {"input": 0.13, "output": 0.0},
+}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and its finished children (Unix only)."""
+    import resource
+    import sys
+
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def estimate_cost(model, input_tokens=0, output_tokens=0):
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return None
+    return (input_tokens * prices["input"] + output_tokens * prices["output"]) / 1_000_000
+
+
+class RunProfile:
+    def __init__(self, run_id=None, emit=True, track_memory=False, on_start=None):
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.emit = emit
+        self.track_memory = track_memory
+        # Called with the stage name as each span opens (job progress); an exception raised there aborts the run
+        self.on_start = on_start
+        self.spans = []
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage, **attributes):
+        """Time the block; the yielded dict can be filled with attributes as the stage runs."""
+        if self.on_start is not None:
+            self.on_start(stage)
+        record = dict(attributes)
+        started = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record["error"] = str(e)
+            raise
+        finally:
+            record = {
+                "run_id": self.run_id,
+                "stage": stage,
+                "start_ms": round((started - self._started) * 1000, 1),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                **record,
+            }
+            if self.track_memory:
+                record["peak_rss_mb"] = peak_rss_mb()
+            if "model" in record and ("input_tokens" in record or "output_tokens" in record):
+                record["cost_usd"] = estimate_cost(record["model"], record.get("input_tokens", 0), record.get("output_tokens", 0))
+            with self._lock:
+                self.spans.append(record)
+            if self.emit:
+                print(json.dumps({"event": "span", **record}, default=str))
+
+    def summary(self):
+        with self._lock:
+            spans = list(self.spans)
+        stages = {}
+        for span in spans:
+            stages[span["stage"]] = stages.get(span["stage"], 0.0) + span["duration_ms"]
+        costs = [span["cost_usd"] for span in spans if span.get("cost_usd") is not None]
+        # From the first span's start to the last span's end; per-stage sums can exceed it
+        total_ms = max(span["start_ms"] + span["duration_ms"] for span in spans) - min(span["start_ms"] for span in spans) if spans else 0.0
+        return {
+            "run_id": self.run_id,
+            "total_ms": round(total_ms, 1),
+            "stages_ms": {stage: round(ms, 1) for stage, ms in stages.items()},
+            "input_tokens": sum(span.get("input_tokens", 0) for span in spans),
+            "output_tokens": sum(span.get("output_tokens", 0) for span in spans),
+            "cost_usd": sum(costs) if costs else None,
+        }
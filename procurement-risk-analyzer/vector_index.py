@@ -0,0 +1,188 @@
+"""Persistent FAISS index for the historical corpus.
+
+Every document is keyed by a hash of its source and content. Syncing the index
+against the current corpus only embeds documents that are new or changed and
+deletes the ones that no longer exist, so unchanged history costs nothing.
+
+The index type is configurable. "flat" is exact search over float32 vectors.
+"ivf", "hnsw", "ivfpq" and "sqfp16" trade some recall for less memory and
+faster search on large histories. Types that need training are trained on a
+sample of the vectors, and retrained (from the embedding cache) once the corpus
+has outgrown the size they were trained for.
+"""
+
+import hashlib
+import json
+import math
+import os
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "ivfpq", "sqfp16")
+INDEX_CONFIG_FILE = "index_config.json"
+TRAIN_SAMPLE_SIZE = 100_000
+HNSW_NEIGHBORS = 32
+# k-means wants ~39 points per centroid: 8-bit PQ codebooks (256 centroids) only pay off on
+# larger corpora, smaller ones get 4-bit codebooks (16 centroids)
+PQ_8BIT_MIN_VECTORS = 256 * 39
+MIN_TRAINING_VECTORS = {"ivf": 1, "ivfpq": 16}
+# nlist grows with sqrt(n), so 4x the trained size means the lists should double
+RETRAIN_GROWTH = 4
+MIN_VECTORS_PER_LIST = 39
+SEARCH_PARAMETERS = {"ivf": "nprobe=16", "ivfpq": "nprobe=16", "hnsw": "efSearch=64"}
+
+
+def document_id(doc):
+    digest = hashlib.sha256()
+    digest.update(str(doc.metadata.get("source", "")).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(doc.page_content.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def pq_subquantizers(dimension):
+    # About 8 dimensions per sub-quantizer; FAISS needs the count to divide the dimension
+    return next(m for m in range(max(dimension // 8, 1), 0, -1) if dimension % m == 0)
+
+
+def index_factory_string(index_type, dimension, count):
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "hnsw":
+        return f"HNSW{HNSW_NEIGHBORS}"
+    if index_type == "sqfp16":
+        return "SQfp16"
+    # The usual 4 * sqrt(n) inverted lists, keeping ~39 training points per centroid
+    nlist = max(1, min(int(4 * math.sqrt(count)), count // MIN_VECTORS_PER_LIST))
+    if index_type == "ivf":
+        return f"IVF{nlist},Flat"
+    if index_type == "ivfpq":
+        return f"IVF{nlist},PQ{pq_subquantizers(dimension)}x{8 if count >= PQ_8BIT_MIN_VECTORS else 4}"
+    raise ValueError(f"Unknown index type {index_type!r}; expected one of {INDEX_TYPES}")
+
+
+def configure_search(index, index_type):
+    import faiss
+
+    if index_type in SEARCH_PARAMETERS:
+        faiss.ParameterSpace().set_index_parameters(index, SEARCH_PARAMETERS[index_type])
+
+
+def build_faiss_index(index_type, vectors, seed=0):
+    """Create (and train, if needed) an empty index for ``vectors``; returns ``(index, built type)``."""
+    import faiss
+    import numpy as np
+
+    count, dimension = vectors.shape
+    if count < MIN_TRAINING_VECTORS.get(index_type, 0):
+        print(f"⚠️ {count} vectors are too few to train a {index_type} index, using flat")
+        index_type = "flat"
+    index = faiss.index_factory(dimension, index_factory_string(index_type, dimension, count))
+    if not index.is_trained:
+        sample = vectors
+        if count > TRAIN_SAMPLE_SIZE:
+            sample = vectors[np.random.default_rng(seed).choice(count, TRAIN_SAMPLE_SIZE, replace=False)]
+        index.train(sample)
+    configure_search(index, index_type)
+    return index, index_type
+
+
+def read_index_config(index_folder_path):
+    path = os.path.join(index_folder_path, INDEX_CONFIG_FILE)
+    if not os.path.exists(path):
+        # Indexes saved before index types were configurable are flat
+        return {"index_type": "flat", "built_as": "flat"}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def needs_retraining(config, index_type, index, count):
+    """Whether an index trained on a smaller corpus should be rebuilt for ``count`` vectors."""
+    import faiss
+
+    if index_type not in MIN_TRAINING_VECTORS:
+        return False
+    if config["built_as"] != index_type:
+        # Built flat while the corpus was too small to train
+        return count >= MIN_TRAINING_VECTORS[index_type]
+    trained_on = config.get("trained_on")
+    if trained_on is None:
+        # Saved before the trained size was recorded: the fewest vectors that give its nlist
+        trained_on = faiss.extract_index_ivf(index).nlist * MIN_VECTORS_PER_LIST
+    return count > RETRAIN_GROWTH * trained_on
+
+
+def load_faiss_index(index_folder_path, embeddings):
+    from langchain_community.vectorstores import FAISS
+
+    if not os.path.exists(os.path.join(index_folder_path, "index.faiss")):
+        return None
+    try:
+        # The docstore is pickled by FAISS.save_local and only ever written by this app
+        vector_store = FAISS.load_local(str(index_folder_path), embeddings, allow_dangerous_deserialization=True)
+        configure_search(vector_store.index, read_index_config(index_folder_path)["built_as"])
+        return vector_store
+    except Exception as e:
+        print(f"⚠️ Could not load index from {index_folder_path}, rebuilding: {e}")
+        return None
+
+
+def build_vector_store(docs, ids, embeddings, index_type):
+    import numpy as np
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+
+    texts = [doc.page_content for doc in docs]
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    index, built_as = build_faiss_index(index_type, vectors)
+    vector_store = FAISS(embeddings, index, InMemoryDocstore(), {})
+    vector_store.add_embeddings(zip(texts, vectors), metadatas=[doc.metadata for doc in docs], ids=ids)
+    return vector_store, built_as
+
+
+def sync_faiss_index(documents, embeddings, index_folder_path, index_type="flat"):
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}; expected one of {INDEX_TYPES}")
+
+    docs_by_id = {}
+    for doc in documents:
+        docs_by_id.setdefault(document_id(doc), doc)
+
+    vector_store = load_faiss_index(index_folder_path, embeddings)
+    config = read_index_config(index_folder_path)
+    embedding_model = getattr(embeddings, "model_name", None)
+    if vector_store is not None and config["index_type"] != index_type:
+        print(f"🔁 Index type changed from {config['index_type']} to {index_type}, rebuilding")
+        vector_store = None
+    elif vector_store is not None and config.get("embedding_model", embedding_model) != embedding_model:
+        # Vectors from different embedding backends are not comparable (or even the same size)
+        print(f"🔁 Embedding model changed from {config['embedding_model']} to {embedding_model}, rebuilding")
+        vector_store = None
+    elif vector_store is not None and needs_retraining(config, index_type, vector_store.index, len(docs_by_id)):
+        print(f"🔁 Retraining the {index_type} index (built as {config['built_as']}) for {len(docs_by_id)} vectors")
+        vector_store = None
+    indexed_ids = set(vector_store.index_to_docstore_id.values()) if vector_store else set()
+
+    stale_ids = [doc_id for doc_id in indexed_ids if doc_id not in docs_by_id]
+    new_ids = [doc_id for doc_id in docs_by_id if doc_id not in indexed_ids]
+    new_docs = [docs_by_id[doc_id] for doc_id in new_ids]
+
+    # HNSW graphs cannot remove vectors; the rebuild re-embeds from the embedding cache
+    if vector_store is None or (stale_ids and config["built_as"] == "hnsw"):
+        if not docs_by_id:
+            return None
+        vector_store, built_as = build_vector_store(list(docs_by_id.values()), list(docs_by_id), embeddings, index_type)
+        config = {"index_type": index_type, "built_as": built_as, "trained_on": len(docs_by_id)}
+    else:
+        if stale_ids:
+            vector_store.delete(stale_ids)
+        if new_docs:
+            vector_store.add_documents(new_docs, ids=new_ids)
+
+    if new_ids or stale_ids:
+        os.makedirs(index_folder_path, exist_ok=True)
+        vector_store.save_local(str(index_folder_path))
+        with open(os.path.join(index_folder_path, INDEX_CONFIG_FILE), "w", encoding="utf-8") as f:
+            json.dump({**config, "embedding_model": embedding_model}, f)
+
+    print(f"🗂️ Index sync: {len(new_ids)} added, {len(stale_ids)} removed, "
+          f"{len(indexed_ids) - len(stale_ids)} unchanged")
+    return vector_store